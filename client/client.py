@@ -5,7 +5,6 @@ This client can connect to any MCP server and interact with it using
 either Claude (Anthropic) or GPT (OpenAI) models.
 """
 import asyncio
-import json
 import os
 import sys
 import logging
@@ -14,13 +13,26 @@ from enum import Enum
 from contextlib import AsyncExitStack
 
 from mcp import ClientSession, StdioServerParameters
+from mcp.client.sse import sse_client
 from mcp.client.stdio import stdio_client
+from mcp.types import CallToolResult
+
+try:
+    from mcp.client.streamable_http import streamable_http_client
+except ImportError:  # older mcp releases
+    from mcp.client.streamable_http import streamablehttp_client as streamable_http_client
 
 # Import LLM providers
 from anthropic import Anthropic
 from openai import OpenAI
 from dotenv import load_dotenv
 
+# Allow running as a script (python client/client.py) as well as a module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from common import jsoncodec
+from common.tracing import TRACE_FORMATS, tracer
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -31,6 +43,8 @@ logger = logging.getLogger("universal-mcp")
 
 # Load environment variables
 load_dotenv()
+# JSON_CODEC may come from .env, which was not loaded yet when the codec was imported
+jsoncodec.set_backend(os.getenv("JSON_CODEC", ""))
 
 # Define model providers as an enum
 class ModelProvider(str, Enum):
@@ -55,18 +69,24 @@ class UniversalMCPClient:
     
     def __init__(self, 
                  provider: ModelProvider = ModelProvider.ANTHROPIC,
-                 model_name: Optional[str] = None):
+                 model_name: Optional[str] = None,
+                 compact_results: bool = False,
+                 tool_timeout: Optional[float] = None):
         """
         Initialize the Universal MCP client.
         
         Args:
             provider: LLM provider (anthropic or openai)
             model_name: Specific model name (if None, uses default for provider)
+            compact_results: Send tools' structured results to the LLM as compact JSON instead of their text
+            tool_timeout: Seconds a tool call may take, sent to the server as its deadline (server default if None)
         """
         # Initialize session and client objects
         self.session: Optional[ClientSession] = None
         self.exit_stack = AsyncExitStack()
         self._server_path = None
+        self.compact_results = compact_results
+        self.tool_timeout = tool_timeout
         
         # Set provider and model
         self.provider = provider
@@ -123,11 +143,21 @@ class UniversalMCPClient:
         Connect to an MCP server.
         
         Args:
-            server_script_path: Path to the server script (.py or .js)
+            server_script_path: Path to the server script (.py or .js) to start, or the URL of a
+                running server (http://host:port/mcp for streamable HTTP, http://host:port/sse for SSE)
         """
         # Store the server path for reconnection
         self._server_path = server_script_path
         
+        if server_script_path.startswith(("http://", "https://")):
+            logger.info(f"Connecting to server: {server_script_path}")
+            if server_script_path.rstrip("/").endswith("/sse"):
+                transport = await self.exit_stack.enter_async_context(sse_client(server_script_path))
+            else:
+                transport = await self.exit_stack.enter_async_context(streamable_http_client(server_script_path))
+            self.stdio, self.write = transport[0], transport[1]
+            return await self._start_session()
+
         is_python = server_script_path.endswith('.py')
         is_js = server_script_path.endswith('.js')
         if not (is_python or is_js):
@@ -143,17 +173,68 @@ class UniversalMCPClient:
         logger.info(f"Connecting to server: {server_script_path}")
         stdio_transport = await self.exit_stack.enter_async_context(stdio_client(server_params))
         self.stdio, self.write = stdio_transport
+        return await self._start_session()
+
+    async def _start_session(self):
+        """Open the MCP session over the connected transport and return the server's tools."""
         self.session = await self.exit_stack.enter_async_context(ClientSession(self.stdio, self.write))
 
         await self.session.initialize()
 
         # List available tools
-        response = await self.session.list_tools()
+        response = await self._list_tools()
         tools = response.tools
         logger.info(f"Connected to server with tools: {[tool.name for tool in tools]}")
         
         return tools
 
+    async def _list_tools(self):
+        """List the server's tools."""
+        with tracer.span("tools/list", "client", attributes={"mcp.method.name": "tools/list"}):
+            return await self.session.list_tools()
+
+    async def _call_tool(self, tool_name: str, tool_args: Dict[str, Any]) -> CallToolResult:
+        """Call a tool on the server, passing the tool timeout as the call's deadline and the trace context."""
+        with tracer.span(f"tools/call {tool_name}", "client",
+                         attributes={"mcp.method.name": "tools/call", "gen_ai.tool.name": tool_name}) as span:
+            meta: Dict[str, Any] = {}
+            if self.tool_timeout is not None:
+                meta["timeoutMs"] = int(self.tool_timeout * 1000)
+            if span is not None:
+                meta["traceparent"] = span.traceparent
+            result = await self.session.call_tool(tool_name, tool_args, meta=meta or None)
+            if span is not None and result.isError:
+                span.fail("Tool returned an error")
+            return result
+
+    def _chat(self, **kwargs: Any) -> Any:
+        """Send one request to the LLM provider, recorded as a 'chat <model>' span with its token usage."""
+        with tracer.span(f"chat {self.full_model_name}", "client", attributes={
+            "gen_ai.operation.name": "chat",
+            "gen_ai.system": self.provider.value,
+            "gen_ai.request.model": self.full_model_name,
+        }) as span:
+            if self.provider == ModelProvider.ANTHROPIC:
+                response = self.anthropic.messages.create(model=self.full_model_name, **kwargs)
+            else:
+                response = self.openai.chat.completions.create(model=self.full_model_name, **kwargs)
+            usage = getattr(response, "usage", None)
+            if span is not None and usage is not None:
+                # Anthropic reports input/output tokens, OpenAI prompt/completion tokens
+                input_tokens = getattr(usage, "input_tokens", None) or getattr(usage, "prompt_tokens", None)
+                output_tokens = getattr(usage, "output_tokens", None) or getattr(usage, "completion_tokens", None)
+                if input_tokens is not None:
+                    span.set("gen_ai.usage.input_tokens", input_tokens)
+                if output_tokens is not None:
+                    span.set("gen_ai.usage.output_tokens", output_tokens)
+            return response
+
+    def _tool_result_text(self, result: CallToolResult) -> str:
+        """Return what the LLM sees of a tool result: compact structured JSON if enabled and available, else the text."""
+        if self.compact_results and result.structuredContent is not None:
+            return jsoncodec.dumps(result.structuredContent)
+        return "\n".join(c.text for c in result.content if hasattr(c, 'text'))
+
     async def process_query(self, query: str) -> str:
         """
         Process a query using the configured LLM and available tools.
@@ -169,13 +250,14 @@ class UniversalMCPClient:
         
         logger.info(f"Processing query: {query}")
         
-        # Get available tools from the server
-        tool_response = await self.session.list_tools()
-        
-        if self.provider == ModelProvider.ANTHROPIC:
-            return await self._process_anthropic_query(query, tool_response.tools)
-        else:  # OPENAI
-            return await self._process_openai_query(query, tool_response.tools)
+        with tracer.span("process_query", attributes={"gen_ai.system": self.provider.value}):
+            # Get available tools from the server
+            tool_response = await self._list_tools()
+
+            if self.provider == ModelProvider.ANTHROPIC:
+                return await self._process_anthropic_query(query, tool_response.tools)
+            else:  # OPENAI
+                return await self._process_openai_query(query, tool_response.tools)
 
     async def _process_anthropic_query(self, query: str, tools: List[Any]) -> str:
         """Process query using Anthropic's Claude."""
@@ -195,8 +277,7 @@ class UniversalMCPClient:
 
         # Initial Claude API call
         try:
-            response = self.anthropic.messages.create(
-                model=self.full_model_name,
+            response = self._chat(
                 max_tokens=1000,
                 messages=messages,
                 tools=available_tools
@@ -220,8 +301,8 @@ class UniversalMCPClient:
                 # Execute tool call
                 try:
                     logger.info(f"Calling tool {tool_name} with args {tool_args}")
-                    result = await self.session.call_tool(tool_name, tool_args)
-                    tool_result_text = "\n".join(c.text for c in result.content if hasattr(c, 'text'))
+                    result = await self._call_tool(tool_name, tool_args)
+                    tool_result_text = self._tool_result_text(result)
                     final_text.append(f"[Calling tool {tool_name} with args {tool_args}]")
                     final_text.append(f"[Tool result: {tool_result_text}]")
                 except Exception as e:
@@ -240,15 +321,15 @@ class UniversalMCPClient:
                         {
                             "type": "tool_result",
                             "tool_use_id": content.id,
-                            "content": tool_result_text
+                            "content": tool_result_text,
+                            "is_error": bool(result.isError)
                         }
                     ]
                 })
 
                 # Get next response from Claude
                 try:
-                    response = self.anthropic.messages.create(
-                        model=self.full_model_name,
+                    response = self._chat(
                         max_tokens=1000,
                         messages=messages,
                         tools=available_tools
@@ -283,8 +364,7 @@ class UniversalMCPClient:
 
         # Initial OpenAI API call
         try:
-            response = self.openai.chat.completions.create(
-                model=self.full_model_name,
+            response = self._chat(
                 messages=messages,
                 tools=available_tools,
                 max_tokens=1000
@@ -308,8 +388,8 @@ class UniversalMCPClient:
                 tool_name = tool_call.function.name
                 try:
                     # Parse the JSON arguments
-                    tool_args = json.loads(tool_call.function.arguments)
-                except json.JSONDecodeError:
+                    tool_args = jsoncodec.loads(tool_call.function.arguments)
+                except ValueError:
                     # Fallback if JSON parsing fails
                     logger.error(f"Failed to parse arguments for {tool_name}: {tool_call.function.arguments}")
                     final_text.append(f"[Error: Could not parse arguments for {tool_name}]")
@@ -318,8 +398,8 @@ class UniversalMCPClient:
                 # Execute tool call
                 try:
                     logger.info(f"Calling tool {tool_name} with args {tool_args}")
-                    result = await self.session.call_tool(tool_name, tool_args)
-                    tool_result_text = "\n".join(content.text for content in result.content if hasattr(content, 'text'))
+                    result = await self._call_tool(tool_name, tool_args)
+                    tool_result_text = self._tool_result_text(result)
                     final_text.append(f"[Calling tool {tool_name} with args {tool_args}]")
                     final_text.append(f"[Tool result: {tool_result_text}]")
                 except Exception as e:
@@ -352,8 +432,7 @@ class UniversalMCPClient:
                 
                 # Get next response from OpenAI
                 try:
-                    response = self.openai.chat.completions.create(
-                        model=self.full_model_name,
+                    response = self._chat(
                         messages=messages,
                         max_tokens=1000
                     )
@@ -438,17 +517,27 @@ async def main():
     import argparse
     
     parser = argparse.ArgumentParser(description="Universal MCP Client")
-    parser.add_argument("server_script", help="Path to the MCP server script (.py or .js)")
+    parser.add_argument("server_script", help="Path to the MCP server script (.py or .js), or the URL of a running server")
     parser.add_argument("--provider", "-p", type=str, choices=["anthropic", "openai"], 
                       default="anthropic", help="LLM provider (default: anthropic)")
     parser.add_argument("--model", "-m", type=str, help="Model name to use")
+    parser.add_argument("--compact-results", action="store_true",
+                      help="Send structured tool results to the LLM as compact JSON")
+    parser.add_argument("--tool-timeout", type=float, help="Seconds each tool call may take")
+    parser.add_argument("--trace-file", default=os.environ.get("TRACE_FILE") or None,
+                      help="Append spans of queries, LLM and tool calls to this file (default: TRACE_FILE)")
+    parser.add_argument("--trace-format", choices=TRACE_FORMATS,
+                      default=(os.environ.get("TRACE_FORMAT") or "otlp").lower(),
+                      help="Trace file format: OTLP/JSON lines or Chrome trace events (default: otlp)")
     
     args = parser.parse_args()
     
     provider = ModelProvider.ANTHROPIC if args.provider == "anthropic" else ModelProvider.OPENAI
     
     try:
-        client = UniversalMCPClient(provider=provider, model_name=args.model)
+        tracer.configure(args.trace_file, args.trace_format, service="universal-mcp-client")
+        client = UniversalMCPClient(provider=provider, model_name=args.model, compact_results=args.compact_results,
+                                    tool_timeout=args.tool_timeout)
         await client.connect_to_server(args.server_script)
         await client.chat_loop()
     except KeyboardInterrupt:
@@ -458,6 +547,7 @@ async def main():
     finally:
         if 'client' in locals():
             await client.cleanup()
+        tracer.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
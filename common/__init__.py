@@ -0,0 +1 @@
+"""Code shared by the Universal MCP client and server."""
\ No newline at end of file
@@ -0,0 +1,194 @@
+"""
+JSON encoding and decoding through the fastest available backend.
+
+orjson is used when installed, then msgspec, then the standard library
+json module. All backends accept bytes or text, produce compact UTF-8
+output (with null for NaN and infinite floats) and raise ValueError for
+malformed input, so callers do not depend on which one is active. Force a
+backend with JSON_CODEC=orjson|msgspec|json, either in the environment
+(read on import) or by calling set_backend() once settings are loaded, as
+the server does with its JSON_CODEC setting.
+
+Compare the backends on recorded payloads with:
+    python common/jsoncodec.py --benchmark [FILE ...]
+"""
+import importlib.util
+import json
+import math
+import os
+from typing import Any, Callable, Dict, Tuple, Union
+
+JSONInput = Union[bytes, bytearray, memoryview, str]
+
+
+def _stdlib_backend() -> Tuple[Callable[[JSONInput], Any], Callable[[Any, bool], bytes]]:
+    def loads(data: JSONInput) -> Any:
+        if isinstance(data, memoryview):
+            data = bytes(data)
+        return json.loads(data)
+
+    def dumpb(obj: Any, indent: bool = False) -> bytes:
+        options: Dict[str, Any] = {"indent": 2} if indent else {"separators": (",", ":")}
+        try:
+            text = json.dumps(obj, ensure_ascii=False, allow_nan=False, **options)
+        except ValueError:
+            # NaN and infinities are not JSON; write null for them, as orjson and msgspec do
+            text = json.dumps(_finite(obj), ensure_ascii=False, allow_nan=False, **options)
+        return text.encode("utf-8")
+
+    return loads, dumpb
+
+
+def _finite(obj: Any) -> Any:
+    """Copy of obj with NaN and infinite floats replaced by None."""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {key: _finite(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(value) for value in obj]
+    return obj
+
+
+def _orjson_backend() -> Tuple[Callable[[JSONInput], Any], Callable[[Any, bool], bytes]]:
+    import orjson
+
+    def dumpb(obj: Any, indent: bool = False) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0))
+
+    return orjson.loads, dumpb
+
+
+def _msgspec_backend() -> Tuple[Callable[[JSONInput], Any], Callable[[Any, bool], bytes]]:
+    import msgspec
+
+    decoder = msgspec.json.Decoder()
+    encoder = msgspec.json.Encoder()
+
+    def loads(data: JSONInput) -> Any:
+        try:
+            return decoder.decode(data)
+        except msgspec.DecodeError as e:
+            raise ValueError(str(e)) from None
+
+    def dumpb(obj: Any, indent: bool = False) -> bytes:
+        data = encoder.encode(obj)
+        return msgspec.json.format(data, indent=2) if indent else data
+
+    return loads, dumpb
+
+
+BACKENDS: Dict[str, Callable[[], Tuple[Callable[[JSONInput], Any], Callable[[Any, bool], bytes]]]] = {
+    "orjson": _orjson_backend,
+    "msgspec": _msgspec_backend,
+    "json": _stdlib_backend,
+}
+
+
+def _installed(name: str) -> bool:
+    return name == "json" or importlib.util.find_spec(name) is not None
+
+
+def available_backends() -> Dict[str, Tuple[Callable[[JSONInput], Any], Callable[[Any, bool], bytes]]]:
+    """Return the installed backends, fastest first, as {name: (loads, dumpb)}."""
+    return {name: factory() for name, factory in BACKENDS.items() if _installed(name)}
+
+
+def _select_backend(requested: str) -> str:
+    requested = requested.strip().lower()
+    if requested in BACKENDS and _installed(requested):
+        return requested
+    return next(name for name in BACKENDS if _installed(name))
+
+
+# Name of the active backend
+BACKEND = _select_backend(os.getenv("JSON_CODEC", ""))
+_loads, _dumpb = BACKENDS[BACKEND]()
+
+
+def set_backend(name: str) -> str:
+    """
+    Switch to the named backend, or to the fastest installed one if name is empty or not installed.
+
+    Returns:
+        Name of the backend now active
+    """
+    global BACKEND, _loads, _dumpb
+    selected = _select_backend(name)
+    if selected != BACKEND:
+        _loads, _dumpb = BACKENDS[selected]()
+        BACKEND = selected
+    return BACKEND
+
+
+def loads(data: JSONInput) -> Any:
+    """
+    Decode a JSON document.
+
+    Args:
+        data: UTF-8 bytes (preferred, avoids a decode step) or text
+
+    Raises:
+        ValueError: If the document is not valid JSON
+    """
+    return _loads(data)
+
+
+def dumpb(obj: Any, indent: bool = False) -> bytes:
+    """Encode an object as compact (or, with indent, 2-space indented) UTF-8 JSON bytes."""
+    return _dumpb(obj, indent)
+
+
+def dumps(obj: Any, indent: bool = False) -> str:
+    """Encode an object as compact (or, with indent, 2-space indented) JSON text."""
+    return _dumpb(obj, indent).decode("utf-8")
+
+
+def benchmark(payloads: Dict[str, bytes], rounds: int = 200) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """
+    Time decoding and encoding of payloads with every installed backend.
+
+    Args:
+        payloads: Recorded documents keyed by a label (e.g., file name)
+        rounds: Repetitions per measurement
+
+    Returns:
+        {label: {backend: {"loads_us": ..., "dumps_us": ...}}}, in microseconds per call
+    """
+    import timeit
+
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    backends = available_backends()
+    for label, payload in payloads.items():
+        obj = json.loads(payload)
+        results[label] = {}
+        for name, (decode, encode) in backends.items():
+            results[label][name] = {
+                "loads_us": min(timeit.repeat(lambda: decode(payload), number=rounds, repeat=3)) / rounds * 1e6,
+                "dumps_us": min(timeit.repeat(lambda: encode(obj, False), number=rounds, repeat=3)) / rounds * 1e6,
+            }
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    default_payload = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server", "data", "coins.json")
+    parser = argparse.ArgumentParser(description="Inspect and benchmark the JSON codec backends")
+    parser.add_argument("--benchmark", nargs="*", metavar="FILE",
+                        help=f"Recorded JSON payloads to time (default: {default_payload})")
+    parser.add_argument("--rounds", type=int, default=200, help="Repetitions per measurement")
+    args = parser.parse_args()
+
+    print(f"Active backend: {BACKEND} (installed: {', '.join(available_backends())})")
+    if args.benchmark is not None:
+        payloads = {}
+        for path in args.benchmark or [default_payload]:
+            with open(path, "rb") as fh:
+                payloads[os.path.basename(path)] = fh.read()
+        for label, timings in benchmark(payloads, args.rounds).items():
+            baseline = timings["json"]
+            print(f"\n{label} ({len(payloads[label]) / 1024:.1f} KiB)")
+            for name, t in timings.items():
+                print(f"  {name:8} loads {t['loads_us']:9.1f} us ({baseline['loads_us'] / t['loads_us']:4.1f}x)"
+                      f"   dumps {t['dumps_us']:9.1f} us ({baseline['dumps_us'] / t['dumps_us']:4.1f}x)")
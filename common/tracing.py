@@ -0,0 +1,267 @@
+"""
+Span tracing across the client, the MCP transport and upstream APIs.
+
+Spans are written to a local file, so traces can be inspected offline:
+either as OTLP/JSON lines (one ExportTraceServiceRequest per line, the
+format of the OpenTelemetry file exporter and collector file receiver) or
+in the Chrome trace event format (open in ui.perfetto.dev or
+chrome://tracing). The trace continues across processes through W3C
+`traceparent` values: the client sends one in the _meta of each tools/call
+request, and the server sends one as an HTTP header to upstream APIs.
+
+Tracing is off until configure() is given a file; spans then cost a
+single check.
+"""
+import contextvars
+import functools
+import inspect
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, TextIO, Tuple
+
+from common import jsoncodec
+
+TRACE_FORMATS = ("otlp", "chrome")
+
+# OTLP SpanKind values
+_SPAN_KINDS = {"internal": 1, "server": 2, "client": 3}
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+
+def parse_traceparent(value: Any) -> Optional[Tuple[str, str]]:
+    """Return (trace id, parent span id) from a W3C traceparent value, or None if it is missing or invalid."""
+    match = _TRACEPARENT.match(value.strip().lower()) if isinstance(value, str) else None
+    if match is None or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return match.group(1), match.group(2)
+
+
+class Span:
+    """A timed operation within a trace."""
+
+    __slots__ = ("name", "kind", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, kind: str, trace_id: str, parent_id: Optional[str],
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = dict(attributes or {})
+        self.error: Optional[str] = None
+
+    @property
+    def traceparent(self) -> str:
+        """W3C traceparent value making this span the parent of the receiver's spans."""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set(self, key: str, value: Any) -> None:
+        """Set an attribute (e.g., 'http.response.status_code')."""
+        self.attributes[key] = value
+
+    def fail(self, message: str) -> None:
+        """Mark the operation as failed."""
+        self.error = message
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class _FileExporter:
+    """Appends finished spans to a file, one write per span."""
+
+    def __init__(self, path: str, fmt: str, service: str):
+        if fmt not in TRACE_FORMATS:
+            raise ValueError(f"Trace format must be one of {', '.join(TRACE_FORMATS)}, got {fmt!r}")
+        self.path = path
+        self.format = fmt
+        self.service = service
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file: TextIO = open(path, "a", encoding="utf-8")
+        if fmt == "chrome":
+            # The JSON array format may be left unterminated, so several processes can append to one file
+            if self._file.tell() == 0:
+                self._file.write("[\n")
+            self._write({"name": "process_name", "ph": "M", "pid": os.getpid(), "args": {"name": service}})
+
+    def _write(self, event: Dict[str, Any]) -> None:
+        line = jsoncodec.dumps(event)
+        with self._lock:
+            self._file.write(line + (",\n" if self.format == "chrome" else "\n"))
+            self._file.flush()
+
+    def export(self, span: Span) -> None:
+        if self.format == "chrome":
+            self._write({
+                "name": span.name,
+                "cat": span.kind,
+                "ph": "X",
+                "ts": span.start_ns / 1000,
+                "dur": (span.end_ns - span.start_ns) / 1000,
+                "pid": os.getpid(),
+                # One track per trace keeps each request's spans together
+                "tid": int(span.trace_id[:8], 16),
+                "args": {**span.attributes, "trace_id": span.trace_id, "span_id": span.span_id,
+                         "parent_id": span.parent_id, **({"error": span.error} if span.error else {})},
+            })
+            return
+
+        otlp_span: Dict[str, Any] = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": _SPAN_KINDS[span.kind],
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span.attributes.items()],
+            "status": {"code": 2, "message": span.error} if span.error else {},
+        }
+        if span.parent_id:
+            otlp_span["parentSpanId"] = span.parent_id
+        self._write({"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service}}]},
+            "scopeSpans": [{"scope": {"name": "universal-mcp"}, "spans": [otlp_span]}],
+        }]})
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class Tracer:
+    """Creates spans, tracks the current one per task and hands finished spans to the file exporter."""
+
+    def __init__(self):
+        self._exporter: Optional[_FileExporter] = None
+        self._current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+    @property
+    def enabled(self) -> bool:
+        return self._exporter is not None
+
+    def configure(self, path: Optional[str], fmt: str = "otlp", service: str = "universal-mcp") -> None:
+        """
+        Start writing spans to a file, or stop tracing if path is None.
+
+        Args:
+            path: Trace file, appended to if it exists
+            fmt: 'otlp' (OTLP/JSON lines) or 'chrome' (Chrome trace event format)
+            service: Service name recorded with the spans (e.g., 'universal-mcp-server')
+
+        Raises:
+            ValueError: If the format is unknown
+            OSError: If the file cannot be opened
+        """
+        current = self._exporter
+        if current is not None and (current.path, current.format, current.service) == (path, fmt, service):
+            return
+        self._exporter = _FileExporter(os.path.expanduser(path), fmt, service) if path else None
+        if current is not None:
+            current.close()
+
+    def close(self) -> None:
+        """Stop tracing and close the trace file."""
+        self.configure(None)
+
+    def current(self) -> Optional[Span]:
+        """Return the span of the running operation, if any."""
+        return self._current.get()
+
+    def traceparent(self) -> Optional[str]:
+        """Return the traceparent value to send along with an outgoing request, if tracing."""
+        span = self._current.get()
+        return span.traceparent if span is not None else None
+
+    @contextmanager
+    def span(self, name: str, kind: str = "internal", parent: Optional[str] = None,
+             attributes: Optional[Dict[str, Any]] = None) -> Iterator[Optional[Span]]:
+        """
+        Time the enclosed block as a span (yields None while tracing is off).
+
+        The span is a child of the current span, or of `parent` (a traceparent
+        received from another process) if given; otherwise it starts a trace.
+        An exception leaving the block marks the span as failed.
+        """
+        exporter = self._exporter
+        if exporter is None:
+            yield None
+            return
+
+        remote = parse_traceparent(parent)
+        current = self._current.get()
+        if remote is not None:
+            trace_id, parent_id = remote
+        elif current is not None:
+            trace_id, parent_id = current.trace_id, current.span_id
+        else:
+            trace_id, parent_id = os.urandom(16).hex(), None
+        span = Span(name, kind, trace_id, parent_id, attributes)
+        token = self._current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.fail(f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            self._current.reset(token)
+            span.end_ns = time.time_ns()
+            exporter.export(span)
+
+    def instrument(self, kind: str = "server",
+                   parent: Optional[Callable[[], Optional[str]]] = None) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+        """
+        Decorator running each call of a tool function (sync or async) in a 'tools/call <name>' span.
+
+        Args:
+            kind: Span kind
+            parent: Returns the caller's traceparent for the call being handled, if any
+
+        The wrapper keeps the function's name, signature and annotations, so
+        it can be registered with FastMCP like the function itself.
+        """
+        def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+            name = f"tools/call {fn.__name__}"
+            attributes = {"mcp.method.name": "tools/call", "gen_ai.tool.name": fn.__name__}
+
+            def finish(span: Optional[Span], result: Any) -> Any:
+                structured = getattr(result, "structuredContent", None)
+                if span is not None and isinstance(structured, dict) and "error" in structured:
+                    span.fail(str(structured["error"]))
+                return result
+
+            if inspect.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def wrapper(*args: Any, **kwargs: Any) -> Any:
+                    if not self.enabled:
+                        return await fn(*args, **kwargs)
+                    with self.span(name, kind, parent() if parent else None, attributes) as span:
+                        return finish(span, await fn(*args, **kwargs))
+            else:
+                @functools.wraps(fn)
+                def wrapper(*args: Any, **kwargs: Any) -> Any:
+                    if not self.enabled:
+                        return fn(*args, **kwargs)
+                    with self.span(name, kind, parent() if parent else None, attributes) as span:
+                        return finish(span, fn(*args, **kwargs))
+            return wrapper
+        return decorator
+
+
+# Tracer shared by everything in the process
+tracer = Tracer()
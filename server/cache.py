@@ -0,0 +1,323 @@
+"""
+In-process caches used by the server tools to avoid repeated upstream calls.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+import httpx
+
+from server.resilience import Deadline
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire after a fixed time-to-live."""
+
+    def __init__(self, maxsize: int = 256, ttl: float = 600.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the cache.
+
+        Args:
+            maxsize: Maximum number of entries kept before the least recently used is evicted
+            ttl: Seconds an entry stays valid after it was stored
+            clock: Monotonic time source (overridable for testing)
+        """
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None,
+            accept: Optional[Callable[[Any], bool]] = None) -> Any:
+        """
+        Return the cached value for key, or default if it is missing or expired.
+
+        If given, accept(value) decides whether the cached value serves this
+        lookup; a rejected value counts as a miss and default is returned.
+        """
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return default
+        expires_at, value = item
+        if expires_at <= self._clock():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+        if accept is not None and not accept(value):
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value, evicting the least recently used entry if the cache is full."""
+        self._data[key] = (self._clock() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def configure(self, maxsize: int, ttl: float) -> None:
+        """
+        Change the size limit and default time-to-live, keeping the current entries.
+
+        Entries beyond the new maxsize are evicted (least recently used first);
+        stored entries keep the expiry they were given.
+        """
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove an entry and return its value (default if missing)."""
+        item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def clear(self) -> None:
+        """Drop every entry (counters are kept)."""
+        self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the cache counters and current size."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls into one.
+
+    The first caller for a key starts the work; callers arriving while it is
+    still running await the same result (or exception) instead of repeating it.
+
+    The work runs under the deadline of the caller that started it, so a
+    caller only joins a call whose deadline is at least as far away as its
+    own; one with more time starts a fresh call that later callers join.
+    A short deadline therefore never cuts the work short for a patient caller.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, Tuple["asyncio.Task[Any]", Optional[Deadline]]] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]],
+                 deadline: Optional[Deadline] = None) -> Any:
+        """
+        Run fn once per key at a time and share its result.
+
+        Args:
+            key: Identity of the call, e.g. (tool name, normalized arguments)
+            fn: Coroutine function performing the work (under `deadline`, if it uses one)
+            deadline: Deadline fn runs under (None if it has no time limit)
+
+        Returns:
+            The result of fn
+        """
+        running = self._calls.get(key)
+        if running is not None and self._covers(running[1], deadline):
+            task = running[0]
+            self.coalesced += 1
+        else:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = (task, deadline)
+            task.add_done_callback(lambda t: self._done(key, t))
+        # Shield the shared task so one cancelled caller does not cancel it for the others
+        return await asyncio.shield(task)
+
+    @staticmethod
+    def _covers(running: Optional[Deadline], deadline: Optional[Deadline]) -> bool:
+        # Whether a call running under `running` has at least the time a caller with `deadline` has
+        if running is None:
+            return True
+        return deadline is not None and running.expires_at >= deadline.expires_at
+
+    def _done(self, key: Hashable, task: "asyncio.Task[Any]") -> None:
+        running = self._calls.get(key)
+        if running is not None and running[0] is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # Mark as retrieved even if every caller went away
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the number of calls performed and coalesced."""
+        return {
+            "in_flight": len(self._calls),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+        }
+
+
+@dataclass
+class CachedResponse:
+    """Body and headers of a cached HTTP response."""
+    body: bytes
+    headers: Dict[str, str]
+    fresh_until: float
+
+
+def _cache_control(headers: httpx.Headers) -> Dict[str, Optional[str]]:
+    """Parse the Cache-Control header into a {directive: value} mapping."""
+    directives: Dict[str, Optional[str]] = {}
+    for part in headers.get("cache-control", "").split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"') or None
+    return directives
+
+
+class HTTPCache:
+    """
+    Cache of upstream HTTP responses following HTTP caching semantics.
+
+    Responses are fresh for their Cache-Control max-age (minus Age) and are
+    then revalidated with If-None-Match / If-Modified-Since; a 304 reply
+    reuses the cached body. Responses marked no-store, or carrying neither a
+    max-age nor a validator, are not cached.
+    """
+
+    # Headers kept with the body; content-encoding/length are dropped because the body is stored decoded
+    STORED_HEADERS = ("content-type", "cache-control", "etag", "last-modified", "date")
+
+    def __init__(self, maxsize: int = 256, retention: float = 86400.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the cache.
+
+        Args:
+            maxsize: Maximum number of cached responses
+            retention: Seconds a stale response is kept around for revalidation
+            clock: Monotonic time source (overridable for testing)
+        """
+        self._clock = clock
+        self._entries = TTLCache(maxsize=maxsize, ttl=retention, clock=clock)
+        self.fresh_hits = 0
+        self.stale = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.stale_served = 0
+
+    def lookup(self, key: Hashable) -> Tuple[Optional[CachedResponse], Dict[str, str]]:
+        """
+        Look up a request.
+
+        Args:
+            key: Cache key of the request (e.g., its full URL)
+
+        Returns:
+            The cached response if it is still fresh (else None), and the
+            conditional headers to send when it has to be revalidated
+        """
+        entry: Optional[CachedResponse] = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None, {}
+        if entry.fresh_until > self._clock():
+            self.fresh_hits += 1
+            return entry, {}
+
+        self.stale += 1
+        conditional = {}
+        if "etag" in entry.headers:
+            conditional["If-None-Match"] = entry.headers["etag"]
+        if "last-modified" in entry.headers:
+            conditional["If-Modified-Since"] = entry.headers["last-modified"]
+        return None, conditional
+
+    def resize(self, maxsize: int) -> None:
+        """Change the maximum number of cached responses, evicting the least recently used overflow."""
+        self._entries.configure(maxsize, self._entries.ttl)
+
+    def get_stale(self, key: Hashable) -> Optional[CachedResponse]:
+        """Return a cached response even if it is no longer fresh (when there is no time to revalidate)."""
+        entry: Optional[CachedResponse] = self._entries.get(key)
+        if entry is not None:
+            self.stale_served += 1
+        return entry
+
+    def _freshness(self, headers: httpx.Headers) -> Optional[float]:
+        directives = _cache_control(headers)
+        if "no-store" in directives:
+            return None
+        max_age = 0.0
+        if "max-age" in directives and "no-cache" not in directives:
+            try:
+                max_age = max(float(directives["max-age"] or 0) - float(headers.get("age", 0)), 0.0)
+            except ValueError:
+                max_age = 0.0
+        return max_age
+
+    def store(self, key: Hashable, response: httpx.Response) -> None:
+        """Cache a 200 response if its headers allow it."""
+        if response.status_code != 200:
+            return
+        max_age = self._freshness(response.headers)
+        has_validator = "etag" in response.headers or "last-modified" in response.headers
+        if max_age is None or (not max_age and not has_validator):
+            return
+        headers = {name: response.headers[name] for name in self.STORED_HEADERS if name in response.headers}
+        self._entries.set(key, CachedResponse(response.content, headers, self._clock() + max_age))
+
+    def revalidate(self, key: Hashable, response: httpx.Response) -> Optional[CachedResponse]:
+        """
+        Apply a 304 Not Modified reply to the cached entry.
+
+        Returns:
+            The refreshed cached response, or None if it was evicted meanwhile
+        """
+        entry: Optional[CachedResponse] = self._entries.get(key)
+        if entry is None:
+            return None
+        max_age = self._freshness(response.headers)
+        for name in self.STORED_HEADERS:
+            if name in response.headers and name != "content-type":
+                entry.headers[name] = response.headers[name]
+        entry.fresh_until = self._clock() + (max_age or 0.0)
+        self._entries.set(key, entry)
+        self.revalidated += 1
+        return entry
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the number of fresh hits, stale lookups, revalidations, stale responses served and misses."""
+        lookups = self.fresh_hits + self.stale + self.misses
+        # Revalidated and stale-served lookups also avoided downloading the body again
+        hits = self.fresh_hits + self.revalidated + self.stale_served
+        return {
+            "size": len(self._entries),
+            "maxsize": self._entries.maxsize,
+            "fresh_hits": self.fresh_hits,
+            "stale": self.stale,
+            "revalidated": self.revalidated,
+            "stale_served": self.stale_served,
+            "misses": self.misses,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,299 @@
+"""
+Local index mapping cryptocurrency tickers and names to CoinGecko ids.
+
+The index is built from a snapshot of CoinGecko's /coins/list endpoint
+stored on disk, so 'BTC', 'Bitcoin' and 'bitcoin' all resolve to the
+canonical id without a failed upstream call first. Entries earlier in the
+snapshot win when several coins share a ticker or name; the refresh
+command below writes the coins with the largest market cap first.
+
+Refresh the snapshot with:
+    python server/coins.py --refresh [--output PATH]
+"""
+import asyncio
+import bisect
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger("universal-mcp")
+
+# Snapshot shipped with the server; override with COINS_LIST_PATH
+DEFAULT_COINS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "coins.json")
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_coin_key(text: str) -> str:
+    """Fold case and drop separators, so 'Bitcoin Cash' matches 'bitcoin-cash'."""
+    return _NON_ALNUM.sub("", text.casefold())
+
+
+class CoinIndex:
+    """Lazily loaded lookup table from tickers, names and ids to CoinGecko ids."""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Initialize the index (the snapshot is read on first use).
+
+        Args:
+            path: Path to a /coins/list snapshot (defaults to COINS_LIST_PATH or the bundled file)
+        """
+        self.path = path or os.getenv("COINS_LIST_PATH", DEFAULT_COINS_PATH)
+        self._lock = threading.Lock()
+        self._ids: Optional[Dict[str, str]] = None
+        self._exact: Dict[str, str] = {}
+        # Sorted normalized keys, searched with bisect for prefix matches
+        self._keys: List[str] = []
+
+    def _load(self) -> Dict[str, str]:
+        with self._lock:
+            if self._ids is not None:
+                return self._ids
+            try:
+                with open(self.path, "r", encoding="utf-8") as fh:
+                    coins = json.load(fh)
+            except (OSError, ValueError):
+                coins = []
+
+            ids: Dict[str, str] = {}
+            exact: Dict[str, str] = {}
+            # Ids take precedence over names, which take precedence over tickers
+            for field in ("id", "name", "symbol"):
+                for coin in coins:
+                    coin_id = coin.get("id")
+                    if not coin_id or not coin.get(field):
+                        continue
+                    ids.setdefault(coin_id, coin_id)
+                    exact.setdefault(normalize_coin_key(coin[field]), coin_id)
+            self._exact = exact
+            self._keys = sorted(exact)
+            self._ids = ids
+            return ids
+
+    def __len__(self) -> int:
+        return len(self._load())
+
+    def resolve(self, text: str) -> Optional[str]:
+        """
+        Resolve a ticker, name or id to a CoinGecko id.
+
+        Args:
+            text: User supplied coin reference (e.g., 'BTC', 'Bitcoin', 'bitcoin')
+
+        Returns:
+            The canonical id, or None if the coin is not in the snapshot
+        """
+        ids = self._load()
+        if text in ids:
+            return text
+        return self._exact.get(normalize_coin_key(text))
+
+    def suggest(self, prefix: str, limit: int = 5) -> List[str]:
+        """
+        Return ids of coins whose ticker, name or id starts with prefix.
+
+        Args:
+            prefix: Beginning of a ticker, name or id
+            limit: Maximum number of suggestions
+
+        Returns:
+            Distinct ids, in key order
+        """
+        self._load()
+        key = normalize_coin_key(prefix)
+        if not key:
+            return []
+        suggestions: List[str] = []
+        start = bisect.bisect_left(self._keys, key)
+        for candidate in self._keys[start:]:
+            if not candidate.startswith(key) or len(suggestions) >= limit:
+                break
+            coin_id = self._exact[candidate]
+            if coin_id not in suggestions:
+                suggestions.append(coin_id)
+        return suggestions
+
+
+class HotCoinTicker:
+    """
+    Background refresher keeping prices of frequently requested coins in memory.
+
+    Every interval the ticker fetches, in one batched request, the watchlist
+    plus the most requested coins since the last refreshes. Lookups are served
+    from memory while the data is at most max_staleness seconds old; data older
+    than one interval is still served, but wakes the refresher early
+    (stale-while-revalidate).
+    """
+
+    def __init__(self,
+                 fetch: Callable[[List[str]], Awaitable[Dict[str, Any]]],
+                 watchlist: Iterable[str] = (),
+                 top_n: int = 10,
+                 interval: float = 60.0,
+                 max_staleness: float = 300.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the ticker (call start() to begin refreshing).
+
+        Args:
+            fetch: Coroutine function returning CoinGecko price data for a list of ids
+            watchlist: Coin ids that are always refreshed
+            top_n: Number of most requested coins refreshed in addition to the watchlist
+            interval: Seconds between refreshes
+            max_staleness: Maximum age in seconds of data served from memory
+            clock: Monotonic time source (overridable for testing)
+        """
+        self._fetch = fetch
+        self.watchlist = list(dict.fromkeys(watchlist))
+        self.top_n = top_n
+        self.interval = interval
+        self.max_staleness = max_staleness
+        self._clock = clock
+        self._prices: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._requests: Counter = Counter()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    def record(self, coin_id: str) -> None:
+        """Count a request for a coin, making it a candidate for background refresh."""
+        self._requests[coin_id] += 1
+
+    def update(self, prices: Dict[str, Any]) -> None:
+        """Store freshly fetched price data."""
+        now = self._clock()
+        for coin_id, data in prices.items():
+            self._prices[coin_id] = (now, data)
+
+    def get(self, coin_id: str) -> Optional[Dict[str, Any]]:
+        """Return in-memory price data for a coin, or None if it is missing or too old."""
+        item = self._prices.get(coin_id)
+        if item is None:
+            return None
+        age = self._clock() - item[0]
+        if age > self.max_staleness:
+            return None
+        if age > self.interval:
+            self._wake.set()
+        return item[1]
+
+    def hot_coins(self) -> List[str]:
+        """Return the coins refreshed in the background: watchlist first, then the most requested."""
+        coins = dict.fromkeys(self.watchlist)
+        for coin_id, _ in self._requests.most_common(self.top_n):
+            coins.setdefault(coin_id)
+        return list(coins)
+
+    async def refresh(self) -> None:
+        """Fetch prices for all hot coins in one request."""
+        coins = self.hot_coins()
+        # Halve request counts so 'hot' reflects recent traffic rather than all-time totals
+        self._requests = Counter({k: v // 2 for k, v in self._requests.items() if v > 1})
+        cutoff = self._clock() - self.max_staleness
+        self._prices = {k: v for k, v in self._prices.items() if v[0] >= cutoff}
+        if not coins:
+            return
+        self.update(await self._fetch(coins))
+        self.refreshes += 1
+
+    async def _run(self) -> None:
+        while True:
+            # asyncio.wait, unlike wait_for, never swallows a cancellation that races the wake-up
+            waiter = asyncio.ensure_future(self._wake.wait())
+            try:
+                await asyncio.wait({waiter}, timeout=self.interval)
+            finally:
+                waiter.cancel()
+            self._wake.clear()
+            try:
+                await self.refresh()
+            except Exception as e:
+                self.refresh_errors += 1
+                logger.warning(f"Error refreshing hot coin prices: {str(e)}")
+
+    def start(self) -> None:
+        """Start the background refresh task on the running event loop."""
+        if self._task is None:
+            self._wake.set()  # Fetch the watchlist right away
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Cancel the background refresh task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the tracked coins and refresh counters."""
+        return {
+            "hot_coins": self.hot_coins(),
+            "cached_coins": len(self._prices),
+            "interval": self.interval,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+        }
+
+
+def refresh_snapshot(path: str = DEFAULT_COINS_PATH, ranked_pages: int = 4) -> int:
+    """
+    Download /coins/list and write it to path, largest market caps first.
+
+    Args:
+        path: Where to write the snapshot
+        ranked_pages: Number of 250-coin /coins/markets pages used for ordering
+
+    Returns:
+        Number of coins written
+    """
+    import httpx
+
+    base_url = "https://api.coingecko.com/api/v3"
+    with httpx.Client(base_url=base_url, timeout=30.0) as client:
+        response = client.get("/coins/list")
+        response.raise_for_status()
+        coins = response.json()
+
+        rank: Dict[str, int] = {}
+        for page in range(1, ranked_pages + 1):
+            response = client.get("/coins/markets", params={
+                "vs_currency": "usd",
+                "order": "market_cap_desc",
+                "per_page": 250,
+                "page": page
+            })
+            response.raise_for_status()
+            for market in response.json():
+                rank.setdefault(market["id"], len(rank))
+
+    coins.sort(key=lambda coin: rank.get(coin["id"], len(rank)))
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write("[\n")
+        fh.write(",\n".join("  " + json.dumps({k: coin[k] for k in ("id", "symbol", "name")}, ensure_ascii=False)
+                            for coin in coins))
+        fh.write("\n]\n")
+    return len(coins)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage the local CoinGecko coin index")
+    parser.add_argument("--refresh", action="store_true", help="Download a fresh /coins/list snapshot")
+    parser.add_argument("--output", default=DEFAULT_COINS_PATH, help="Snapshot path")
+    args = parser.parse_args()
+
+    if args.refresh:
+        print(f"Wrote {refresh_snapshot(args.output)} coins to {args.output}")
+    else:
+        print(f"{len(CoinIndex(args.output))} coins in {args.output}")
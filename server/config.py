@@ -0,0 +1,278 @@
+"""
+Typed, validated server configuration.
+
+Settings are loaded once at startup from, in increasing precedence:
+built-in defaults, the .env file, the process environment, and an optional
+JSON config file named by CONFIG_FILE. The config file is a flat object
+using the same names as the environment variables, e.g.
+
+    {"WEATHER_CACHE_TTL": 300, "UPSTREAM_SERPAPI_READ_TIMEOUT": 30}
+
+It wins over the environment so that a running server can be retuned by
+editing it and sending SIGHUP; the server then loads a new ServerConfig
+and swaps it in atomically, keeping its caches and connection pools warm.
+"""
+import os
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from dotenv import dotenv_values, find_dotenv
+
+from common import jsoncodec
+from common.tracing import TRACE_FORMATS
+from server.upstream import DEFAULT_SETTINGS, UPSTREAMS, UpstreamSettings
+
+# Units accepted by OpenWeatherMap
+WEATHER_UNITS = ("metric", "imperial", "standard")
+
+# Transports the server can be run with (see server.py --transport)
+SERVER_TRANSPORTS = ("stdio", "sse", "streamable-http")
+
+
+class ConfigError(ValueError):
+    """Raised when configuration values are missing their expected type or range."""
+
+    def __init__(self, problems: List[str]):
+        self.problems = problems
+        super().__init__("Invalid configuration: " + "; ".join(problems))
+
+
+@dataclass(frozen=True)
+class ToolSettings:
+    """Limits applied to every call of one tool."""
+    # Seconds a call may take unless the caller sends timeoutMs in the request _meta
+    timeout: float = 15.0
+    # Upper bound for the tool's `count` argument, where it has one
+    max_count: int = 10
+
+
+# Per-tool defaults; anything not listed uses the ToolSettings defaults
+DEFAULT_TOOL_SETTINGS: Dict[str, ToolSettings] = {
+    "get_news_headlines": ToolSettings(timeout=20.0),
+    "web_search": ToolSettings(timeout=30.0),
+}
+
+
+@dataclass(frozen=True)
+class ServerConfig:
+    """Everything the server tools and shared resources can be tuned with."""
+    # How clients connect; the HTTP transports serve many sessions from one process
+    transport: str = "stdio"
+    host: str = "127.0.0.1"
+    port: int = 8000
+    # Processes serving streamable HTTP on one socket; with more than one, caches move to the shared store
+    workers: int = 1
+    shared_cache_path: Optional[str] = None
+    openweather_api_key: str = ""
+    newsapi_key: str = ""
+    serpapi_key: str = ""
+    weather_units: str = "metric"
+    weather_cache_size: int = 256
+    weather_cache_ttl: float = 600.0
+    weather_concurrency: int = 4
+    geocode_cache_size: int = 1024
+    search_cache_size: int = 256
+    search_cache_ttl: float = 900.0
+    http_cache_size: int = 256
+    crypto_watchlist: Tuple[str, ...] = ()
+    crypto_hot_coins: int = 10
+    crypto_refresh_interval: float = 60.0
+    crypto_max_staleness: float = 300.0
+    joke_buffer_size: int = 20
+    joke_low_water: int = 5
+    coins_list_path: Optional[str] = None
+    dictionary_cache_path: Optional[str] = None
+    dictionary_cache_size: int = 10000
+    dictionary_bundle_path: Optional[str] = None
+    trace_file: Optional[str] = None
+    trace_format: str = "otlp"
+    # JSON backend (orjson, msgspec or json); empty picks the fastest installed one
+    json_codec: str = ""
+    tool_defaults: ToolSettings = ToolSettings()
+    tools: Dict[str, ToolSettings] = field(default_factory=lambda: dict(DEFAULT_TOOL_SETTINGS))
+    upstream_urls: Dict[str, str] = field(default_factory=lambda: dict(UPSTREAMS))
+    upstreams: Dict[str, UpstreamSettings] = field(default_factory=dict)
+
+    def tool(self, name: str) -> ToolSettings:
+        """Return the settings of a tool (the shared defaults if it has none of its own)."""
+        return self.tools.get(name, self.tool_defaults)
+
+
+class _Values:
+    """Typed access to raw string settings, collecting every problem instead of stopping at the first."""
+
+    def __init__(self, values: Mapping[str, str]):
+        self.values = values
+        self.problems: List[str] = []
+
+    def get(self, key: str, default: Any, minimum: Optional[float] = None) -> Any:
+        raw = self.values.get(key)
+        if raw is None or raw == "":
+            return default
+        try:
+            value = type(default)(raw)
+        except ValueError:
+            self.problems.append(f"{key} must be of type {type(default).__name__}, got {raw!r}")
+            return default
+        if minimum is not None and value < minimum:
+            self.problems.append(f"{key} must be at least {minimum}, got {raw!r}")
+            return default
+        return value
+
+    def path(self, key: str) -> Optional[str]:
+        raw = self.values.get(key, "").strip()
+        return os.path.expanduser(raw) if raw else None
+
+    def tools(self) -> Tuple[ToolSettings, Dict[str, ToolSettings]]:
+        defaults = ToolSettings(
+            timeout=self.get("TOOL_TIMEOUT", ToolSettings.timeout, minimum=0.001),
+            max_count=self.get("TOOL_MAX_COUNT", ToolSettings.max_count, minimum=1),
+        )
+        names = set(DEFAULT_TOOL_SETTINGS)
+        for key in self.values:
+            for prefix in ("TOOL_TIMEOUT_", "TOOL_MAX_COUNT_"):
+                if key.startswith(prefix):
+                    names.add(key[len(prefix):].lower())
+
+        tools = {}
+        for name in names:
+            base = DEFAULT_TOOL_SETTINGS.get(name)
+            tools[name] = ToolSettings(
+                # An explicit TOOL_TIMEOUT applies to tools with built-in defaults as well
+                timeout=self.get(f"TOOL_TIMEOUT_{name.upper()}",
+                                 base.timeout if base and "TOOL_TIMEOUT" not in self.values else defaults.timeout,
+                                 minimum=0.001),
+                max_count=self.get(f"TOOL_MAX_COUNT_{name.upper()}", defaults.max_count, minimum=1),
+            )
+        return defaults, tools
+
+    def upstreams(self) -> Tuple[Dict[str, str], Dict[str, UpstreamSettings]]:
+        urls: Dict[str, str] = {}
+        settings: Dict[str, UpstreamSettings] = {}
+        for name, default_url in UPSTREAMS.items():
+            urls[name] = self.values.get(f"UPSTREAM_{name.upper()}_URL") or default_url
+            try:
+                settings[name] = UpstreamSettings.from_env(name, DEFAULT_SETTINGS.get(name), self.values)
+            except ValueError as e:
+                self.problems.append(str(e))
+                settings[name] = DEFAULT_SETTINGS.get(name) or UpstreamSettings()
+        return urls, settings
+
+
+def _file_values(path: str) -> Dict[str, str]:
+    """Read a flat JSON config file, turning values into the strings the environment would hold."""
+    try:
+        with open(path, "rb") as fh:
+            data = jsoncodec.loads(fh.read())
+    except OSError as e:
+        raise ConfigError([f"Cannot read config file {path}: {e.strerror}"]) from None
+    except ValueError as e:
+        raise ConfigError([f"Config file {path} is not valid JSON: {e}"]) from None
+    if not isinstance(data, dict):
+        raise ConfigError([f"Config file {path} must contain a JSON object"])
+
+    values = {}
+    for key, value in data.items():
+        if isinstance(value, bool):
+            values[key] = "true" if value else "false"
+        elif isinstance(value, list):
+            values[key] = ",".join(str(item) for item in value)
+        elif value is not None:
+            values[key] = str(value)
+    return values
+
+
+def load_config(config_file: Optional[str] = None,
+                env_file: Optional[str] = None,
+                environ: Optional[Mapping[str, str]] = None) -> ServerConfig:
+    """
+    Load and validate the configuration.
+
+    Args:
+        config_file: JSON config file (defaults to CONFIG_FILE, none if unset)
+        env_file: .env file (defaults to the nearest .env above this package)
+        environ: Process environment (defaults to os.environ)
+
+    Returns:
+        The new configuration
+
+    Raises:
+        ConfigError: If the config file cannot be read or any value is invalid
+    """
+    environ = os.environ if environ is None else environ
+    env_file = env_file or find_dotenv()
+    merged: Dict[str, str] = {k: v for k, v in (dotenv_values(env_file) if env_file else {}).items() if v is not None}
+    merged.update(environ)
+    config_file = config_file or merged.get("CONFIG_FILE")
+    if config_file:
+        merged.update(_file_values(os.path.expanduser(config_file)))
+
+    values = _Values(merged)
+    tool_defaults, tools = values.tools()
+    upstream_urls, upstreams = values.upstreams()
+    config = ServerConfig(
+        transport=values.get("SERVER_TRANSPORT", ServerConfig.transport).lower(),
+        host=values.get("SERVER_HOST", ServerConfig.host),
+        port=values.get("SERVER_PORT", ServerConfig.port, minimum=1),
+        workers=values.get("SERVER_WORKERS", ServerConfig.workers, minimum=1),
+        shared_cache_path=values.path("SHARED_CACHE_PATH"),
+        openweather_api_key=values.get("OPENWEATHER_API_KEY", ""),
+        newsapi_key=values.get("NEWSAPI_KEY", ""),
+        serpapi_key=values.get("SERPAPI_KEY", ""),
+        weather_units=values.get("WEATHER_UNITS", ServerConfig.weather_units).lower(),
+        weather_cache_size=values.get("WEATHER_CACHE_SIZE", ServerConfig.weather_cache_size, minimum=1),
+        weather_cache_ttl=values.get("WEATHER_CACHE_TTL", ServerConfig.weather_cache_ttl, minimum=0),
+        weather_concurrency=values.get("WEATHER_CONCURRENCY", ServerConfig.weather_concurrency, minimum=1),
+        geocode_cache_size=values.get("GEOCODE_CACHE_SIZE", ServerConfig.geocode_cache_size, minimum=1),
+        search_cache_size=values.get("SEARCH_CACHE_SIZE", ServerConfig.search_cache_size, minimum=1),
+        search_cache_ttl=values.get("SEARCH_CACHE_TTL", ServerConfig.search_cache_ttl, minimum=0),
+        http_cache_size=values.get("HTTP_CACHE_SIZE", ServerConfig.http_cache_size, minimum=1),
+        crypto_watchlist=tuple(s.strip() for s in merged.get("CRYPTO_WATCHLIST", "").split(",") if s.strip()),
+        crypto_hot_coins=values.get("CRYPTO_HOT_COINS", ServerConfig.crypto_hot_coins, minimum=0),
+        crypto_refresh_interval=values.get("CRYPTO_REFRESH_INTERVAL", ServerConfig.crypto_refresh_interval,
+                                           minimum=1),
+        crypto_max_staleness=values.get("CRYPTO_MAX_STALENESS", ServerConfig.crypto_max_staleness, minimum=0),
+        joke_buffer_size=values.get("JOKE_BUFFER_SIZE", ServerConfig.joke_buffer_size, minimum=1),
+        joke_low_water=values.get("JOKE_LOW_WATER", ServerConfig.joke_low_water, minimum=0),
+        coins_list_path=values.path("COINS_LIST_PATH"),
+        dictionary_cache_path=values.path("DICTIONARY_CACHE_PATH"),
+        dictionary_cache_size=values.get("DICTIONARY_CACHE_SIZE", ServerConfig.dictionary_cache_size, minimum=1),
+        dictionary_bundle_path=values.path("DICTIONARY_BUNDLE_PATH"),
+        trace_file=values.path("TRACE_FILE"),
+        trace_format=values.get("TRACE_FORMAT", ServerConfig.trace_format).lower(),
+        json_codec=values.get("JSON_CODEC", ServerConfig.json_codec).strip().lower(),
+        tool_defaults=tool_defaults,
+        tools=tools,
+        upstream_urls=upstream_urls,
+        upstreams=upstreams,
+    )
+    if config.transport not in SERVER_TRANSPORTS:
+        values.problems.append(f"SERVER_TRANSPORT must be one of {', '.join(SERVER_TRANSPORTS)}, got {config.transport!r}")
+    if config.port > 65535:
+        values.problems.append(f"SERVER_PORT must be at most 65535, got {config.port}")
+    if config.weather_units not in WEATHER_UNITS:
+        values.problems.append(f"WEATHER_UNITS must be one of {', '.join(WEATHER_UNITS)}, got {config.weather_units!r}")
+    if config.trace_format not in TRACE_FORMATS:
+        values.problems.append(f"TRACE_FORMAT must be one of {', '.join(TRACE_FORMATS)}, got {config.trace_format!r}")
+    if config.json_codec and config.json_codec not in jsoncodec.BACKENDS:
+        values.problems.append(f"JSON_CODEC must be one of {', '.join(jsoncodec.BACKENDS)}, got {config.json_codec!r}")
+    if config.joke_low_water > config.joke_buffer_size:
+        values.problems.append("JOKE_LOW_WATER must not exceed JOKE_BUFFER_SIZE")
+    if values.problems:
+        raise ConfigError(values.problems)
+    return config
+
+
+def describe(config: ServerConfig) -> Dict[str, Any]:
+    """Return the configuration as plain data, with API keys masked."""
+    data: Dict[str, Any] = {}
+    for f in fields(config):
+        value = getattr(config, f.name)
+        if f.name.endswith("_key"):
+            value = "***" if value else ""
+        elif f.name in ("tools", "upstreams"):
+            value = {name: vars(settings) for name, settings in value.items()}
+        elif f.name == "tool_defaults":
+            value = vars(value)
+        data[f.name] = value
+    return data
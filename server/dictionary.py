@@ -0,0 +1,335 @@
+"""
+Persistent storage for dictionary definitions used by define_word.
+
+Definitions practically never change, so the raw dictionaryapi.dev JSON of
+every looked-up word is kept in a SQLite database that survives restarts.
+The store is capped in size; when it grows past the cap, the least recently
+used words are dropped.
+
+For deployments without network access, definitions can also be served
+from a prebuilt, read-only bundle file that is memory-mapped, so several
+server processes share its pages through the OS page cache.
+
+Pre-seed the store from a word list (one word per line), then export it
+as a bundle, with:
+    python server/dictionary.py --seed words.txt [--db PATH]
+    python server/dictionary.py --build-bundle definitions.bundle [--db PATH]
+"""
+import asyncio
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import time
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+import httpx
+
+# Allow running as a script (python server/dictionary.py) as well as a module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from common import jsoncodec
+from server.cache import TTLCache
+from server.shared import BUSY_TIMEOUT
+
+# Default database location; override with DICTIONARY_CACHE_PATH
+DEFAULT_DB_PATH = os.path.join(os.path.expanduser("~"), ".cache", "universal-mcp", "definitions.db")
+
+# Lookups whose last_used time is written in one statement; hits only need it for compaction
+TOUCH_BATCH = 64
+
+
+class DefinitionStore:
+    """SQLite-backed, size-capped LRU store of raw dictionary entries."""
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 10000, memory_entries: int = 512):
+        """
+        Open (or create) the store and preload the most recently used words.
+
+        Args:
+            path: Database file (defaults to DICTIONARY_CACHE_PATH or DEFAULT_DB_PATH)
+            max_entries: Number of words kept on disk before the least recently used are dropped
+            memory_entries: Number of recently used words also kept decoded in memory
+        """
+        self.path = path or os.getenv("DICTIONARY_CACHE_PATH", DEFAULT_DB_PATH)
+        self.max_entries = max_entries
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+        self._db = sqlite3.connect(self.path, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS definitions ("
+            "word TEXT PRIMARY KEY, data TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS definitions_last_used ON definitions(last_used)")
+        # Worker processes share the file; lookups run on the event loop, so never wait long for a writer
+        self._db.execute(f"PRAGMA busy_timeout = {int(BUSY_TIMEOUT * 1000)}")
+        self._count = self._db.execute("SELECT COUNT(*) FROM definitions").fetchone()[0]
+
+        self._memory = TTLCache(maxsize=memory_entries, ttl=float("inf"))
+        rows = self._db.execute(
+            "SELECT word, data FROM definitions ORDER BY last_used DESC LIMIT ?", (memory_entries,)
+        ).fetchall()
+        for word, data in reversed(rows):
+            self._memory.set(word, jsoncodec.loads(data))
+
+        # word -> time of its latest hit not yet written to last_used
+        self._touched: Dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+        self.compactions = 0
+        self.busy = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def get(self, word: str) -> Optional[Any]:
+        """Return the stored entry for a (normalized) word, or None (also if the database stays locked)."""
+        data = self._memory.get(word)
+        if data is None:
+            try:
+                row = self._db.execute("SELECT data FROM definitions WHERE word = ?", (word,)).fetchone()
+            except sqlite3.OperationalError:
+                self.busy += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            data = jsoncodec.loads(row[0])
+            self._memory.set(word, data)
+        self._touched[word] = time.time()
+        if len(self._touched) >= TOUCH_BATCH:
+            self._flush_touched()
+        self.hits += 1
+        return data
+
+    def _flush_touched(self) -> None:
+        """Write the pending last_used times in one transaction (kept for the next flush if locked)."""
+        if not self._touched:
+            return
+        try:
+            self._db.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError:
+            self.busy += 1
+            return
+        try:
+            self._db.executemany(
+                "UPDATE definitions SET last_used = ? WHERE word = ?",
+                [(used, word) for word, used in self._touched.items()]
+            )
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._touched.clear()
+
+    def put(self, word: str, data: Any) -> None:
+        """
+        Store the entry for a (normalized) word, compacting the store if it is over its cap.
+
+        If another process keeps the database locked, the entry is only kept in memory.
+        """
+        self._touched.pop(word, None)
+        self._memory.set(word, data)
+        try:
+            exists = self._db.execute("SELECT 1 FROM definitions WHERE word = ?", (word,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO definitions (word, data, last_used) VALUES (?, ?, ?)",
+                (word, jsoncodec.dumps(data), time.time())
+            )
+            if not exists:
+                self._count += 1
+            if self._count > self.max_entries:
+                self.compact()
+        except sqlite3.OperationalError:
+            self.busy += 1
+
+    def compact(self) -> None:
+        """Drop least recently used words until the store is at 90% of its cap."""
+        self._flush_touched()
+        excess = self._count - int(self.max_entries * 0.9)
+        if excess > 0:
+            words = self._db.execute(
+                "SELECT word FROM definitions ORDER BY last_used LIMIT ?", (excess,)
+            ).fetchall()
+            self._db.executemany("DELETE FROM definitions WHERE word = ?", words)
+            for (word,) in words:
+                self._memory.pop(word)
+            self.compactions += 1
+        self._count = self._db.execute("SELECT COUNT(*) FROM definitions").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the store size and hit/miss counters."""
+        lookups = self.hits + self.misses
+        return {
+            "size": self._count,
+            "max_entries": self.max_entries,
+            "memory_entries": len(self._memory),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "compactions": self.compactions,
+            "busy": self.busy,
+        }
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        """Iterate over all stored (word, entry) pairs."""
+        for word, data in self._db.execute("SELECT word, data FROM definitions"):
+            yield word, jsoncodec.loads(data)
+
+    def close(self) -> None:
+        """Write pending last_used times and close the database."""
+        self._flush_touched()
+        self._db.close()
+
+
+class DictionaryBundle:
+    """
+    Read-only, memory-mapped dictionary file with a sorted key index.
+
+    Layout (little endian):
+        header: magic (8 bytes), version (uint32), entry count (uint32)
+        index:  one (key offset, key length, value offset, value length)
+                record of (uint64, uint32, uint64, uint32) per word, sorted by key
+        data:   UTF-8 keys and JSON values referenced by the index
+    """
+
+    MAGIC = b"UMCPDICT"
+    VERSION = 1
+    _HEADER = struct.Struct("<8sII")
+    _RECORD = struct.Struct("<QIQI")
+
+    def __init__(self, path: str):
+        """
+        Map a bundle file into memory.
+
+        Args:
+            path: Bundle created with build_bundle()
+        """
+        self.path = path
+        with open(path, "rb") as fh:
+            self._mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self._count = (self._HEADER.unpack_from(self._mm, 0)
+                                       if len(self._mm) >= self._HEADER.size else (b"", 0, 0))
+        if magic != self.MAGIC or version != self.VERSION:
+            self._mm.close()
+            raise ValueError(f"Not a dictionary bundle (version {self.VERSION}): {path}")
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _record(self, i: int) -> Tuple[int, int, int, int]:
+        return self._RECORD.unpack_from(self._mm, self._HEADER.size + i * self._RECORD.size)
+
+    def get(self, word: str) -> Optional[Any]:
+        """Binary search the index for a (normalized) word and decode its entry."""
+        key = word.encode("utf-8")
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            key_offset, key_length, value_offset, value_length = self._record(mid)
+            candidate = self._mm[key_offset:key_offset + key_length]
+            if candidate < key:
+                lo = mid + 1
+            elif candidate > key:
+                hi = mid
+            else:
+                self.hits += 1
+                return jsoncodec.loads(self._mm[value_offset:value_offset + value_length])
+        self.misses += 1
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the bundle size and hit/miss counters."""
+        return {"path": self.path, "size": self._count, "hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        """Unmap the file."""
+        self._mm.close()
+
+
+def build_bundle(path: str, items: Iterable[Tuple[str, Any]]) -> int:
+    """
+    Write a DictionaryBundle file.
+
+    Args:
+        path: Output file
+        items: (normalized word, dictionary entry) pairs
+
+    Returns:
+        Number of words written
+    """
+    entries = sorted(
+        (word.encode("utf-8"), jsoncodec.dumpb(data))
+        for word, data in dict(items).items()
+    )
+    header = DictionaryBundle._HEADER
+    record = DictionaryBundle._RECORD
+    offset = header.size + len(entries) * record.size
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as fh:
+        fh.write(header.pack(DictionaryBundle.MAGIC, DictionaryBundle.VERSION, len(entries)))
+        for key, value in entries:
+            fh.write(record.pack(offset, len(key), offset + len(key), len(value)))
+            offset += len(key) + len(value)
+        for key, value in entries:
+            fh.write(key)
+            fh.write(value)
+    # Replace atomically so processes mapping the old file keep a consistent view
+    os.replace(tmp_path, path)
+    return len(entries)
+
+
+async def seed(store: DefinitionStore, words: Iterable[str], concurrency: int = 4) -> int:
+    """
+    Fetch and store definitions for words that are not in the store yet.
+
+    Args:
+        store: Store to fill
+        words: Words to look up
+        concurrency: Maximum number of parallel requests
+
+    Returns:
+        Number of words added
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    added = 0
+
+    async def fetch(client: httpx.AsyncClient, word: str) -> None:
+        nonlocal added
+        async with semaphore:
+            response = await client.get(f"/api/v2/entries/en/{word}")
+        if response.status_code == 200:
+            store.put(word, jsoncodec.loads(response.content))
+            added += 1
+
+    pending = list(dict.fromkeys(" ".join(w.split()).casefold() for w in words if w.strip()))
+    pending = [word for word in pending if store.get(word) is None]
+    async with httpx.AsyncClient(base_url="https://api.dictionaryapi.dev", timeout=10.0) as client:
+        await asyncio.gather(*(fetch(client, word) for word in pending), return_exceptions=True)
+    return added
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage the persistent definition store")
+    parser.add_argument("--seed", metavar="WORDLIST", help="File with one word per line to pre-fetch")
+    parser.add_argument("--build-bundle", metavar="BUNDLE", help="Export the store as a memory-mappable bundle")
+    parser.add_argument("--db", help="Database path")
+    args = parser.parse_args()
+
+    store = DefinitionStore(args.db)
+    if args.seed:
+        with open(args.seed, "r", encoding="utf-8") as fh:
+            print(f"Added {asyncio.run(seed(store, fh))} definitions")
+    print(f"{len(store)} definitions in {store.path}")
+    if args.build_bundle:
+        print(f"Wrote {build_bundle(args.build_bundle, store.items())} definitions to {args.build_bundle}")
+    store.close()
@@ -0,0 +1,170 @@
+"""
+In-memory joke buffers refilled in the background.
+
+JokeAPI returns up to ten jokes per request, so instead of one round trip
+per joke the server keeps a small ring buffer per requested category. A
+background task tops a buffer up in one batched request as soon as it
+drops below the low-water mark, and jokes served recently are skipped so
+users do not see the same joke twice in a row.
+"""
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set
+
+logger = logging.getLogger("universal-mcp")
+
+# Most jokes JokeAPI returns per request
+JOKE_BATCH_SIZE = 10
+
+
+class JokeBuffer:
+    """
+    Per-category ring buffers of prefetched jokes.
+
+    get() pops a joke from memory; only when a category's buffer is empty
+    (e.g. on its first request) does the caller wait for a fetch. Buffers
+    that fall below low_water are refilled by the background task started
+    with start().
+    """
+
+    def __init__(self,
+                 fetch: Callable[[str], Awaitable[List[Dict[str, Any]]]],
+                 capacity: int = 20,
+                 low_water: int = 5,
+                 recent: int = 200):
+        """
+        Initialize empty buffers (call start() to begin refilling in the background).
+
+        Args:
+            fetch: Coroutine function returning a batch of JokeAPI jokes for a category
+            capacity: Jokes kept per category
+            low_water: A buffer holding fewer jokes than this is refilled
+            recent: Number of recently served joke ids never handed out again
+        """
+        self._fetch = fetch
+        self.capacity = capacity
+        self.low_water = low_water
+        self._buffers: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._recent: Deque[Any] = deque(maxlen=recent)
+        self._recent_ids: Set[Any] = set()
+        self._refilling: Dict[str, "asyncio.Task[None]"] = {}
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.served = 0
+        self.misses = 0
+        self.refills = 0
+        self.refill_errors = 0
+        self.duplicates = 0
+
+    def configure(self, capacity: int, low_water: int) -> None:
+        """Change the buffer size and low-water mark, keeping the buffered jokes that still fit."""
+        self.capacity = capacity
+        self.low_water = low_water
+        for category, buffer in self._buffers.items():
+            self._buffers[category] = deque(buffer, maxlen=capacity)
+
+    async def get(self, category: str) -> Dict[str, Any]:
+        """
+        Return a joke from a category, fetching a batch first if none is buffered.
+
+        Args:
+            category: Normalized JokeAPI category (e.g., 'any', 'programming')
+
+        Raises:
+            Exception: Whatever fetch raised, if the buffer was empty and the fetch failed
+        """
+        buffer = self._buffers.setdefault(category, deque(maxlen=self.capacity))
+        if not buffer:
+            self.misses += 1
+        # Loop, as concurrent callers may take every joke of a batch before this one gets to it
+        while not buffer:
+            try:
+                await self._refill_once(category)
+            except Exception:
+                # Do not keep refilling a category that does not work (e.g., a misspelled one)
+                if not self._buffers.get(category):
+                    self._buffers.pop(category, None)
+                raise
+            buffer = self._buffers.setdefault(category, deque(maxlen=self.capacity))
+        joke = buffer.popleft()
+        self._remember(joke.get("id"))
+        self.served += 1
+        if len(buffer) < self.low_water:
+            self._wake.set()
+        return joke
+
+    def _remember(self, joke_id: Any) -> None:
+        if joke_id is None or joke_id in self._recent_ids:
+            return
+        if len(self._recent) == self._recent.maxlen:
+            self._recent_ids.discard(self._recent[0])
+        self._recent.append(joke_id)
+        self._recent_ids.add(joke_id)
+
+    async def _refill_once(self, category: str) -> None:
+        """Refill a category, sharing one fetch between concurrent callers."""
+        task = self._refilling.get(category)
+        if task is None:
+            task = asyncio.ensure_future(self.refill(category))
+            self._refilling[category] = task
+            task.add_done_callback(lambda t: self._refilling.pop(category, None))
+        await asyncio.shield(task)
+
+    async def refill(self, category: str) -> None:
+        """Fetch one batch and buffer the jokes that were neither served recently nor are already buffered."""
+        jokes = await self._fetch(category)
+        if not jokes:
+            raise ValueError(f"No {category} jokes returned")
+        buffer = self._buffers.setdefault(category, deque(maxlen=self.capacity))
+        buffered = {joke.get("id") for joke in buffer}
+        fresh = [joke for joke in jokes if joke.get("id") is None or joke.get("id") not in self._recent_ids]
+        self.duplicates += len(jokes) - len(fresh)
+        # Small categories run out of unseen jokes; repeating them beats refetching on every call
+        for joke in fresh or jokes:
+            joke_id = joke.get("id")
+            if joke_id is None or joke_id not in buffered:
+                buffer.append(joke)
+                buffered.add(joke_id)
+        self.refills += 1
+
+    async def _run(self) -> None:
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            for category, buffer in list(self._buffers.items()):
+                if len(buffer) >= self.low_water:
+                    continue
+                try:
+                    await self._refill_once(category)
+                except Exception as e:
+                    self.refill_errors += 1
+                    logger.warning(f"Error prefetching {category} jokes: {str(e)}")
+
+    def start(self) -> None:
+        """Start the background refill task on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Cancel the background refill task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the buffer fill levels and counters."""
+        return {
+            "buffered": {category: len(buffer) for category, buffer in self._buffers.items()},
+            "capacity": self.capacity,
+            "low_water": self.low_water,
+            "served": self.served,
+            "hit_ratio": (self.served - self.misses) / self.served if self.served else 0.0,
+            "refills": self.refills,
+            "refill_errors": self.refill_errors,
+            "duplicates_skipped": self.duplicates,
+        }
@@ -0,0 +1,177 @@
+"""
+Selective, incremental extraction of fields from large JSON documents.
+
+Search and news APIs return large payloads of which the tools only use a
+few scalar fields and the first `count` items of one array. extract_json()
+walks the document chunk by chunk, one top-level value at a time, so
+unrelated sections are decoded and freed immediately instead of being held
+together with the rest of the payload. Only the wanted array items are
+decoded (optionally keeping just some of their keys), and reading stops as
+soon as they are collected.
+
+The stdlib json module is what makes the walk pay off; with orjson or
+msgspec active (see common/jsoncodec.py), decoding the whole body at
+once and then picking the same fields with select_json() is faster.
+"""
+import codecs
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator, Optional, Union
+
+_NON_WHITESPACE = re.compile(r'\S')
+_DECODER = json.JSONDecoder()
+
+
+class _Reader:
+    """Text buffer filled lazily from a sequence of byte or text chunks."""
+
+    def __init__(self, chunks: Iterable[Union[bytes, str]]):
+        self._chunks: Iterator[Union[bytes, str]] = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+        self.final = False
+
+    def more(self) -> None:
+        """Append the next chunk, dropping the consumed prefix of the buffer."""
+        if self.final:
+            raise ValueError("Truncated JSON document")
+        self.text = self.text[self.pos:]
+        self.pos = 0
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self.final = True
+            self.text += self._decoder.decode(b"", final=True)
+            return
+        self.text += chunk if isinstance(chunk, str) else self._decoder.decode(chunk)
+
+    def grow(self) -> None:
+        """Read chunks until the unconsumed part of the buffer has doubled, or the input ends."""
+        # Growing geometrically keeps the re-decoding of an incomplete value linear overall
+        target = 2 * (len(self.text) - self.pos) + 1
+        self.more()
+        while not self.final and len(self.text) < target:
+            self.more()
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character (without consuming it)."""
+        while True:
+            match = _NON_WHITESPACE.search(self.text, self.pos)
+            if match:
+                self.pos = match.start()
+                return self.text[self.pos]
+            self.pos = len(self.text)
+            self.more()
+
+    def expect(self, chars: str) -> str:
+        """Consume the next non-whitespace character, which must be one of chars."""
+        char = self.peek()
+        if char not in chars:
+            raise ValueError(f"Expected one of {chars!r} at offset {self.pos}, got {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self) -> Any:
+        """Consume and decode the next JSON value, reading more chunks until it is complete."""
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if self.final:
+                    raise ValueError(f"Invalid JSON at offset {self.pos}") from None
+                self.grow()
+                continue
+            # A number at the very end of the buffer may continue in the next chunk
+            if end == len(self.text) and not self.final:
+                self.more()
+                continue
+            self.pos = end
+            return value
+
+
+def extract_json(chunks: Iterable[Union[bytes, str]],
+                 array_key: str,
+                 limit: int,
+                 fields: Iterable[str] = (),
+                 item_fields: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """
+    Extract scalar fields and the first items of one array from a JSON object.
+
+    Args:
+        chunks: The document as an iterable of UTF-8 byte (or text) chunks
+        array_key: Top-level key of the array to collect (e.g., 'organic_results')
+        limit: Maximum number of array items to decode
+        fields: Other top-level keys to decode (e.g., 'status', 'error')
+        item_fields: Keys kept from each array item (all keys if None)
+
+    Reading stops once `limit` items are collected or the array ends, so
+    fields placed after the array in the document are not reported.
+
+    Returns:
+        A dict with the found fields and array_key mapped to the collected items
+        (the key is absent if the document has no such array)
+
+    Raises:
+        ValueError: If the document is not a JSON object or is truncated
+    """
+    wanted = set(fields)
+    keep = None if item_fields is None else tuple(item_fields)
+    result: Dict[str, Any] = {}
+    reader = _Reader(chunks)
+
+    reader.expect("{")
+    if reader.peek() == "}":
+        return result
+
+    while True:
+        key = reader.value()
+        reader.expect(":")
+
+        if key == array_key and reader.peek() == "[":
+            items = result[array_key] = []
+            reader.expect("[")
+            if reader.peek() == "]":
+                return result
+            while len(items) < limit:
+                item = reader.value()
+                if keep is not None and isinstance(item, dict):
+                    item = {k: item[k] for k in keep if k in item}
+                items.append(item)
+                if reader.expect(",]") == "]":
+                    break
+            return result
+        elif key in wanted:
+            result[key] = reader.value()
+        else:
+            reader.value()
+
+        if reader.expect(",}") == "}":
+            return result
+
+
+def select_json(document: Any,
+                array_key: str,
+                limit: int,
+                fields: Iterable[str] = (),
+                item_fields: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """
+    Pick the same fields as extract_json() from an already decoded document.
+
+    Unlike extract_json(), fields placed after the array are reported too.
+
+    Raises:
+        ValueError: If the document is not a JSON object
+    """
+    if not isinstance(document, dict):
+        raise ValueError("Expected a JSON object")
+    keep = None if item_fields is None else tuple(item_fields)
+    result = {key: document[key] for key in fields if key in document}
+    items = document.get(array_key)
+    if isinstance(items, list):
+        items = items[:limit]
+        if keep is not None:
+            items = [{k: item[k] for k in keep if k in item} if isinstance(item, dict) else item for item in items]
+        result[array_key] = items
+    return result
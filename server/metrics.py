@@ -0,0 +1,250 @@
+"""
+Call counters and latency histograms for tools and upstream APIs.
+
+Recording is a few integer updates and one bisect into fixed buckets, so
+it stays cheap enough to run on every call. Percentiles are estimated
+from the buckets; the same buckets are exported as Prometheus histograms.
+Fixed buckets also make the figures of several worker processes add up
+exactly (see CallStats.state() and merge_states()).
+"""
+import bisect
+import functools
+import inspect
+import time
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+# Upper bounds in seconds of the latency buckets (a final +Inf bucket is implied)
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram."""
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        """Record one duration."""
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, counts: List[int], total: float, maximum: float) -> None:
+        """Add the bucket counts, sum and maximum of a histogram with the same bounds."""
+        if len(counts) != len(self.counts):
+            raise ValueError("Cannot merge histograms with different buckets")
+        self.counts = [a + b for a, b in zip(self.counts, counts)]
+        self.count += sum(counts)
+        self.sum += total
+        self.max = max(self.max, maximum)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Estimate the q-th quantile (0..1) in seconds, interpolating within its bucket (None if empty)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.bounds[i - 1] if i else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / bucket_count, self.max)
+            seen += bucket_count
+        return self.max
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the count, mean and estimated p50/p90/p99 in milliseconds."""
+        def ms(value: Optional[float]) -> Optional[float]:
+            return None if value is None else round(value * 1000, 3)
+
+        return {
+            "count": self.count,
+            "mean_ms": ms(self.sum / self.count) if self.count else None,
+            "p50_ms": ms(self.percentile(0.5)),
+            "p90_ms": ms(self.percentile(0.9)),
+            "p99_ms": ms(self.percentile(0.99)),
+            "max_ms": ms(self.max) if self.count else None,
+        }
+
+
+class CallStats:
+    """Call and error counts, in-flight gauge and latency histogram of one tool or upstream."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.latency = Histogram()
+
+    def start(self) -> float:
+        """Mark a call as started; pass the returned timestamp to finish()."""
+        self.in_flight += 1
+        if self.in_flight > self.max_in_flight:
+            self.max_in_flight = self.in_flight
+        return time.perf_counter()
+
+    def finish(self, started: float, error: bool = False) -> None:
+        """Mark a call started at `started` as finished."""
+        self.in_flight -= 1
+        self.calls += 1
+        if error:
+            self.errors += 1
+        self.latency.observe(time.perf_counter() - started)
+
+    def discard(self) -> None:
+        """Mark a started call as abandoned without an outcome (e.g., a hedge that lost the race)."""
+        self.in_flight -= 1
+
+    def state(self) -> Dict[str, Any]:
+        """Return the raw counters and buckets, which merge() adds up across processes."""
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "buckets": list(self.latency.counts),
+            "sum": self.latency.sum,
+            "max": self.latency.max,
+        }
+
+    def merge(self, state: Mapping[str, Any]) -> None:
+        """Add the counters of another process's state() (e.g., another worker's) to these."""
+        self.calls += state["calls"]
+        self.errors += state["errors"]
+        self.in_flight += state["in_flight"]
+        self.max_in_flight = max(self.max_in_flight, state["max_in_flight"])
+        self.latency.merge(state["buckets"], state["sum"], state["max"])
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the counters, the error ratio and the latency summary."""
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "error_ratio": self.errors / self.calls if self.calls else 0.0,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "latency": self.latency.as_dict(),
+        }
+
+
+def merge_states(states: Iterable[Mapping[str, Mapping[str, Any]]]) -> Dict[str, CallStats]:
+    """Add up {name: CallStats.state()} snapshots taken in several processes."""
+    merged: Dict[str, CallStats] = {}
+    for snapshot in states:
+        for name, state in snapshot.items():
+            merged.setdefault(name, CallStats()).merge(state)
+    return merged
+
+
+def _failed(result: Any) -> bool:
+    # Tools report failures as results carrying an `error` field rather than by raising
+    structured = getattr(result, "structuredContent", None)
+    return bool(getattr(result, "isError", False)) or isinstance(structured, dict) and "error" in structured
+
+
+class ToolMetrics:
+    """Per-tool CallStats, filled in by wrapping the tool functions with instrument()."""
+
+    def __init__(self):
+        self.tools: Dict[str, CallStats] = {}
+
+    def instrument(self, fn: Callable[..., Any]) -> Callable[..., Any]:
+        """
+        Wrap a tool function (sync or async) to record its calls.
+
+        The wrapper keeps the function's name, signature and annotations, so
+        it can be registered with FastMCP like the function itself.
+        """
+        stats = self.tools.setdefault(fn.__name__, CallStats())
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args: Any, **kwargs: Any) -> Any:
+                started = stats.start()
+                try:
+                    result = await fn(*args, **kwargs)
+                except BaseException:
+                    stats.finish(started, error=True)
+                    raise
+                stats.finish(started, error=_failed(result))
+                return result
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                started = stats.start()
+                try:
+                    result = fn(*args, **kwargs)
+                except BaseException:
+                    stats.finish(started, error=True)
+                    raise
+                stats.finish(started, error=_failed(result))
+                return result
+        return wrapper
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels: str) -> str:
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def prometheus_text(tools: Mapping[str, CallStats],
+                    upstreams: Mapping[str, CallStats],
+                    cache_ratios: Mapping[str, float]) -> str:
+    """
+    Render the metrics in the Prometheus text exposition format (version 0.0.4).
+
+    Args:
+        tools: CallStats per tool name
+        upstreams: CallStats per upstream name
+        cache_ratios: Hit ratio per cache name
+
+    Returns:
+        The metrics text, one family per counter, gauge and histogram
+    """
+    lines: List[str] = []
+
+    def family(name: str, kind: str, help_text: str, samples: Iterable[Tuple[str, float]]) -> None:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(f"{name}{labels} {_number(value)}" for labels, value in samples)
+
+    for prefix, label, stats in (("mcp_tool", "tool", tools), ("mcp_upstream", "upstream", upstreams)):
+        what = "tool calls" if label == "tool" else "upstream requests"
+        family(f"{prefix}_calls_total", "counter", f"Completed {what}.",
+               ((_labels(**{label: name}), s.calls) for name, s in stats.items()))
+        family(f"{prefix}_errors_total", "counter", f"Failed {what}.",
+               ((_labels(**{label: name}), s.errors) for name, s in stats.items()))
+        family(f"{prefix}_in_flight", "gauge", f"Running {what}.",
+               ((_labels(**{label: name}), s.in_flight) for name, s in stats.items()))
+
+        histogram = f"{prefix}_duration_seconds"
+        lines.append(f"# HELP {histogram} Duration of {what} in seconds.")
+        lines.append(f"# TYPE {histogram} histogram")
+        for name, s in stats.items():
+            cumulative = 0
+            for bound, bucket_count in zip((*s.latency.bounds, "+Inf"), s.latency.counts):
+                cumulative += bucket_count
+                le = bound if isinstance(bound, str) else _number(bound)
+                lines.append(f"{histogram}_bucket{_labels(**{label: name, 'le': le})} {cumulative}")
+            lines.append(f"{histogram}_sum{_labels(**{label: name})} {_number(s.latency.sum)}")
+            lines.append(f"{histogram}_count{_labels(**{label: name})} {s.latency.count}")
+
+    family("mcp_cache_hit_ratio", "gauge", "Share of cache lookups answered from the cache.",
+           ((_labels(cache=name), ratio) for name, ratio in cache_ratios.items()))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,412 @@
+"""
+Guards protecting the upstream APIs and the server from each other.
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+
+class RateLimitExceeded(Exception):
+    """Raised when no request token becomes available before the caller's deadline."""
+
+    def __init__(self, name: str, retry_after: float):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"Rate limit for {name} reached; retry in {retry_after:.1f}s")
+
+
+class TokenBucket:
+    """
+    Async token bucket that queues callers instead of rejecting them outright.
+
+    Tokens refill continuously at `rate` per second up to `burst`. Callers are
+    served in arrival order and wait for a token as long as it arrives within
+    their timeout; otherwise RateLimitExceeded is raised without waiting.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int = 1,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize a full bucket.
+
+        Args:
+            name: Name used in errors and metrics (e.g., the upstream name)
+            rate: Tokens added per second
+            burst: Bucket capacity
+            clock: Monotonic time source (overridable for testing)
+        """
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+        self.waiting = 0
+        self.max_waiting = 0
+        self.acquired = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, timeout: float) -> float:
+        """
+        Take one token, waiting up to timeout seconds for it.
+
+        Args:
+            timeout: Maximum seconds to wait
+
+        Returns:
+            Seconds spent waiting
+
+        Raises:
+            RateLimitExceeded: If no token can be obtained within timeout
+        """
+        # A token free right now needs no queueing; without time to wait, that is the only chance
+        # (wait_for on the lock with a zero timeout would fail even when the lock is free)
+        if self.try_acquire():
+            return 0.0
+        if timeout <= 0:
+            self.rejected += 1
+            wait = 1 / self.rate if self._lock.locked() else (1 - self._tokens) / self.rate
+            raise RateLimitExceeded(self.name, wait)
+
+        started = self._clock()
+        deadline = started + timeout
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            try:
+                await asyncio.wait_for(self._lock.acquire(), timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise RateLimitExceeded(self.name, 1 / self.rate) from None
+            try:
+                self._refill()
+                if self._tokens < 1:
+                    wait = (1 - self._tokens) / self.rate
+                    if self._clock() + wait > deadline:
+                        self.rejected += 1
+                        raise RateLimitExceeded(self.name, wait)
+                    await asyncio.sleep(wait)
+                    self._refill()
+                self._tokens = max(self._tokens - 1, 0.0)
+            finally:
+                self._lock.release()
+        finally:
+            self.waiting -= 1
+
+        waited = self._clock() - started
+        self.acquired += 1
+        self.total_wait += waited
+        return waited
+
+    def try_acquire(self) -> bool:
+        """Take one token only if it is available right now and nobody is queued."""
+        if self._lock.locked():
+            return False
+        self._refill()
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        self.acquired += 1
+        return True
+
+    def configure(self, rate: float, burst: int) -> None:
+        """Change the refill rate and capacity, keeping the tokens already earned and the queue."""
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+        self._refill()
+        self.rate = rate
+        self.burst = burst
+        self._tokens = min(self._tokens, float(burst))
+
+    def drain(self) -> None:
+        """Empty the bucket, e.g. after the upstream answered 429 Too Many Requests."""
+        self._refill()
+        self._tokens = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the queue depth, wait time and rejection counters."""
+        self._refill()
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "tokens": round(self._tokens, 3),
+            "queue_depth": self.waiting,
+            "max_queue_depth": self.max_waiting,
+            "acquired": self.acquired,
+            "rejected": self.rejected,
+            "avg_wait_ms": self.total_wait / self.acquired * 1000 if self.acquired else 0.0,
+        }
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"{name} is unavailable (circuit open); retry in {retry_after:.0f}s")
+
+
+class CircuitBreaker:
+    """
+    Per-upstream circuit breaker driven by error rate and latency.
+
+    The outcomes of the last `window` calls are tracked; calls that fail or
+    take longer than `slow_call` seconds count as failures. Once at least
+    `min_calls` are recorded and the failure ratio reaches `failure_ratio`,
+    the circuit opens and calls fail immediately for `open_seconds`. After
+    that a single probe call is let through (half-open): its success closes
+    the circuit, its failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str,
+                 failure_ratio: float = 0.5,
+                 slow_call: float = 5.0,
+                 window: int = 20,
+                 min_calls: int = 5,
+                 open_seconds: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize a closed circuit.
+
+        Args:
+            name: Name used in errors and metrics (e.g., the upstream name)
+            failure_ratio: Share of failed calls in the window that opens the circuit
+            slow_call: Calls slower than this many seconds count as failures
+            window: Number of most recent calls considered
+            min_calls: Calls needed in the window before the circuit can open
+            open_seconds: How long the circuit stays open before probing
+            clock: Monotonic time source (overridable for testing)
+        """
+        self.name = name
+        self.failure_ratio = failure_ratio
+        self.slow_call = slow_call
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self._clock = clock
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probing = False
+        self.state = self.CLOSED
+        self.times_opened = 0
+        self.rejected = 0
+
+    def before_call(self) -> bool:
+        """
+        Check whether a call may go through.
+
+        Returns:
+            Whether the call is the half-open probe (pass it to release())
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with a probe already in flight
+        """
+        if self.state == self.OPEN:
+            remaining = self._opened_at + self.open_seconds - self._clock()
+            if remaining > 0:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, remaining)
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, 0)
+            self._probing = True
+            return True
+        return False
+
+    def record(self, success: bool, duration: float) -> None:
+        """Record the outcome of a call allowed by before_call()."""
+        failed = not success or duration > self.slow_call
+        if self.state == self.HALF_OPEN:
+            self._probing = False
+            if failed:
+                self._open()
+            else:
+                self.state = self.CLOSED
+                self._outcomes.clear()
+            return
+
+        self._outcomes.append(failed)
+        if (self.state == self.CLOSED and len(self._outcomes) >= self.min_calls
+                and sum(self._outcomes) / len(self._outcomes) >= self.failure_ratio):
+            self._open()
+
+    def configure(self, failure_ratio: float, slow_call: float, window: int,
+                  min_calls: int, open_seconds: float) -> None:
+        """Change the thresholds, keeping the current state and the most recent outcomes."""
+        self.failure_ratio = failure_ratio
+        self.slow_call = slow_call
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        if window != self._outcomes.maxlen:
+            self._outcomes = deque(self._outcomes, maxlen=window)
+
+    def release(self, probe: bool) -> None:
+        """Forget a call allowed by before_call() that ended without an outcome (e.g., cancelled)."""
+        # Only the probe itself may free the probe slot; another call ending must not let a second one in
+        if probe:
+            self._probing = False
+
+    def _open(self) -> None:
+        self.state = self.OPEN
+        self._opened_at = self._clock()
+        self._outcomes.clear()
+        self.times_opened += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the circuit state and counters."""
+        return {
+            "state": self.state,
+            "failure_ratio": sum(self._outcomes) / len(self._outcomes) if self._outcomes else 0.0,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
+
+class LatencyWindow:
+    """Recent latencies of an upstream, used to pick the hedging delay."""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        """
+        Initialize an empty window.
+
+        Args:
+            size: Number of most recent samples kept
+            min_samples: Samples needed before percentiles are reported
+        """
+        self._samples: Deque[float] = deque(maxlen=size)
+        self.min_samples = min_samples
+
+    def add(self, seconds: float) -> None:
+        """Record the latency of a successful call."""
+        self._samples.append(seconds)
+
+    def percentile(self, q: float, min_samples: Optional[int] = None) -> Optional[float]:
+        """Return the q-th quantile (0..1) in seconds, or None with fewer than min_samples samples."""
+        if not self._samples or len(self._samples) < (self.min_samples if min_samples is None else min_samples):
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class RetryBudget:
+    """
+    Caps retries and hedged requests to a share of the original requests.
+
+    Every original request deposits `ratio` of a token; every retry or hedge
+    withdraws a whole one. A small reserve lets the first few retries through
+    on an idle upstream, while under load extra requests stay at about
+    `ratio` times the regular traffic, so they cannot exhaust the API quota.
+    """
+
+    def __init__(self, ratio: float = 0.1, reserve: float = 3.0):
+        """
+        Initialize the budget.
+
+        Args:
+            ratio: Extra requests allowed per original request
+            reserve: Balance available at start and maximum balance kept in addition to deposits
+        """
+        self.ratio = ratio
+        self.reserve = reserve
+        self._balance = reserve
+        self.withdrawn = 0
+        self.denied = 0
+
+    def deposit(self) -> None:
+        """Credit one original request."""
+        self._balance = min(self._balance + self.ratio, self.reserve + 10 * self.ratio)
+
+    def try_withdraw(self) -> bool:
+        """Spend one token for a retry or hedge, if the budget allows it."""
+        if self._balance < 1:
+            self.denied += 1
+            return False
+        self._balance -= 1
+        self.withdrawn += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the balance and withdrawal counters."""
+        return {"balance": round(self._balance, 3), "withdrawn": self.withdrawn, "denied": self.denied}
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter for the given (zero-based) retry attempt."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the time left for a tool call cannot cover the next step."""
+
+    def __init__(self, what: str, remaining: float):
+        self.remaining = remaining
+        super().__init__(f"Not enough time left for {what} ({remaining * 1000:.0f} ms remaining)")
+
+
+class Deadline:
+    """
+    Point in time by which a tool call has to answer.
+
+    Created once per tool call and passed down to every step that may wait
+    (rate limiting, connection slots, HTTP timeouts, retries and hedges),
+    so each step only spends what is left of the caller's budget.
+    """
+
+    def __init__(self, timeout: float, clock: Callable[[], float] = time.monotonic):
+        """
+        Start the countdown.
+
+        Args:
+            timeout: Seconds the caller is willing to wait
+            clock: Monotonic time source (overridable for testing)
+        """
+        self.timeout = timeout
+        self._clock = clock
+        self.expires_at = clock() + timeout
+
+    def remaining(self) -> float:
+        """Return the seconds left (0 once the deadline has passed)."""
+        return max(self.expires_at - self._clock(), 0.0)
+
+    def check(self, what: str, needed: float = 0.0) -> float:
+        """
+        Make sure enough time is left for a step.
+
+        Args:
+            what: Description of the step, used in the error
+            needed: Seconds the step is expected to take
+
+        Returns:
+            The seconds left
+
+        Raises:
+            DeadlineExceeded: If no more than `needed` seconds are left
+        """
+        remaining = self.remaining()
+        if remaining <= needed:
+            raise DeadlineExceeded(what, remaining)
+        return remaining
+
+    async def wait(self, awaitable: Awaitable[Any], what: str) -> Any:
+        """Await a result, giving up with DeadlineExceeded when the deadline passes."""
+        try:
+            return await asyncio.wait_for(awaitable, self.remaining())
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(what, 0.0) from None
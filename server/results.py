@@ -0,0 +1,235 @@
+"""
+Structured results returned by the server tools.
+
+Every tool returns MCP structured content typed by one of the TypedDicts
+below, together with a compact text rendering of the same data built in a
+single pass. Clients can read fields directly instead of parsing the text.
+Failures carry only an `error` message (also sent as the text), which is
+why every key is optional.
+"""
+from typing import Any, Dict, List, Optional
+
+from mcp.types import CallToolResult, TextContent
+# Pydantic, which builds the output schemas, needs this TypedDict before Python 3.12
+from typing_extensions import TypedDict
+
+# Currency signs used when formatting prices; other currencies are shown by code only
+CURRENCY_SIGNS = {"usd": "$", "eur": "€", "gbp": "£", "jpy": "¥"}
+
+# Temperature and wind speed units of each OpenWeatherMap unit system
+WEATHER_UNIT_SYMBOLS = {"metric": ("°C", "m/s"), "imperial": ("°F", "mph"), "standard": ("K", "m/s")}
+
+
+class WeatherResult(TypedDict, total=False):
+    city: str
+    conditions: str
+    temperature: float
+    feels_like: float
+    humidity: float
+    wind_speed: float
+    units: str
+    error: str
+
+
+class WeatherManyResult(TypedDict, total=False):
+    units: str
+    # One entry per requested location; a location that failed only has `city` and `error`
+    locations: List[WeatherResult]
+    error: str
+
+
+class CoinPrice(TypedDict):
+    id: str
+    prices: Dict[str, Optional[float]]
+    change_24h: Optional[float]
+
+
+class CryptoPricesResult(TypedDict, total=False):
+    currencies: List[str]
+    coins: List[CoinPrice]
+    not_found: List[str]
+    suggestions: List[str]
+    error: str
+
+
+class Article(TypedDict):
+    title: str
+    source: str
+    published_at: str
+    url: str
+
+
+class NewsResult(TypedDict, total=False):
+    topic: str
+    articles: List[Article]
+    error: str
+
+
+class JokeResult(TypedDict, total=False):
+    category: str
+    joke: str
+    setup: str
+    delivery: str
+    error: str
+
+
+class SearchHit(TypedDict):
+    title: str
+    snippet: str
+    link: str
+
+
+class SearchResult(TypedDict, total=False):
+    query: str
+    results: List[SearchHit]
+    error: str
+
+
+class Definition(TypedDict, total=False):
+    definition: str
+    example: str
+
+
+class Meaning(TypedDict):
+    part_of_speech: str
+    definitions: List[Definition]
+
+
+class DictionaryEntry(TypedDict, total=False):
+    meanings: List[Meaning]
+    pronunciation: str
+
+
+class DefinitionResult(TypedDict, total=False):
+    word: str
+    entries: List[DictionaryEntry]
+    error: str
+
+
+class TimeResult(TypedDict):
+    time: str
+    timezone: str
+
+
+def tool_result(data: Dict[str, Any], text: str) -> CallToolResult:
+    """Wrap structured content and its text rendering into a tool result."""
+    return CallToolResult(content=[TextContent(type="text", text=text)], structuredContent=data)
+
+
+def tool_error(message: str) -> CallToolResult:
+    """Report a failure as text and an `error` field, flagged with isError so clients can tell."""
+    return CallToolResult(content=[TextContent(type="text", text=message)], structuredContent={"error": message},
+                          isError=True)
+
+
+def render_weather(data: WeatherResult) -> str:
+    """Render current weather conditions."""
+    temperature, speed = WEATHER_UNIT_SYMBOLS[data.get("units", "metric")]
+    return (
+        f"Weather in {data['city']}:\n"
+        f"- Conditions: {data['conditions']}\n"
+        f"- Temperature: {data['temperature']}{temperature} (feels like {data['feels_like']}{temperature})\n"
+        f"- Humidity: {data['humidity']}%\n"
+        f"- Wind Speed: {data['wind_speed']} {speed}\n"
+    )
+
+
+def render_weather_many(data: WeatherManyResult) -> str:
+    """Render one compact table row per location."""
+    temperature, speed = WEATHER_UNIT_SYMBOLS[data.get("units", "metric")]
+    lines = [
+        f"Current weather ({temperature}, wind in {speed}):",
+        "City | Conditions | Temp | Feels like | Humidity | Wind",
+    ]
+    for row in data.get("locations", []):
+        if "error" in row:
+            lines.append(f"{row['city']} | {row['error']}")
+        else:
+            lines.append(f"{row['city']} | {row['conditions']} | {row['temperature']} | {row['feels_like']} | "
+                         f"{row['humidity']}% | {row['wind_speed']}")
+    return "\n".join(lines)
+
+
+def render_crypto_prices(data: CryptoPricesResult) -> str:
+    """Render coin prices (24h change is for the first currency), then coins that were not found."""
+    lines: List[str] = []
+    for coin in data.get("coins", []):
+        lines.append(f"Current {coin['id'].upper()} price:")
+        for currency in data["currencies"]:
+            price = coin["prices"].get(currency)
+            lines.append(f"- {currency.upper()}: {CURRENCY_SIGNS.get(currency, '')}{'N/A' if price is None else price}")
+        change = coin["change_24h"]
+        lines.append(f"- 24h Change: {'N/A' if change is None else f'{change:.2f}%'}")
+        lines.append("")
+
+    if data.get("not_found"):
+        message = f"Cryptocurrency not found: {', '.join(data['not_found'])}."
+        if data.get("suggestions"):
+            lines.append(f"{message} Did you mean: {', '.join(data['suggestions'])}?")
+        else:
+            lines.append(f"{message} Check the spelling, or use the ticker (e.g., 'BTC') or CoinGecko id (e.g., 'bitcoin').")
+    return "\n".join(lines).strip()
+
+
+def render_news(data: NewsResult) -> str:
+    """Render numbered headlines with source, date and link."""
+    articles = data.get("articles", [])
+    if not articles:
+        return "No news found for the given criteria."
+
+    about = f" about '{data['topic']}'" if data.get("topic") else ""
+    lines = [f"Top {len(articles)} news headlines{about}:", ""]
+    for i, article in enumerate(articles, 1):
+        lines.append(f"{i}. {article['title']}")
+        lines.append(f"   Source: {article['source']}")
+        pub_date = article["published_at"].split("T")[0]
+        if pub_date:
+            lines.append(f"   Date: {pub_date}")
+        if article["url"]:
+            lines.append(f"   URL: {article['url']}")
+        lines.append("")
+    return "\n".join(lines).strip()
+
+
+def render_joke(data: JokeResult) -> str:
+    """Render a single-part joke, or setup and delivery separated by a blank line."""
+    if "joke" in data:
+        return data["joke"]
+    return f"{data['setup']}\n\n{data['delivery']}"
+
+
+def render_search(data: SearchResult) -> str:
+    """Render numbered search hits with snippet and link."""
+    results = data.get("results", [])
+    if not results:
+        return "No search results found."
+
+    lines = [f"Search results for '{data['query']}':", ""]
+    for i, hit in enumerate(results, 1):
+        lines.append(f"{i}. {hit['title'] or 'No title'}")
+        if hit["snippet"]:
+            lines.append(f"   {hit['snippet']}")
+        if hit["link"]:
+            lines.append(f"   URL: {hit['link']}")
+        lines.append("")
+    return "\n".join(lines).strip()
+
+
+def render_definition(data: DefinitionResult) -> str:
+    """Render the meanings of a word with examples and pronunciation."""
+    entries = data.get("entries", [])
+    if not entries:
+        return f"No definition found for '{data['word']}'."
+
+    lines = [f"Definitions for '{data['word']}':", ""]
+    for entry in entries:
+        for meaning in entry.get("meanings", []):
+            lines.append(f"Part of Speech: {meaning['part_of_speech']}")
+            for i, definition in enumerate(meaning["definitions"], 1):
+                lines.append(f"{i}. {definition.get('definition', '')}")
+                if definition.get("example"):
+                    lines.append(f"   Example: \"{definition['example']}\"")
+                lines.append("")
+        if entry.get("pronunciation"):
+            lines.append(f"Pronunciation: {entry['pronunciation']}")
+    return "\n".join(lines).strip()
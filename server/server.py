@@ -9,27 +9,332 @@ This server exposes several tools that leverage free public APIs for:
 - Random jokes
 """
 import asyncio
-import json
+import logging
 import os
+import signal
+import socket
+import sqlite3
+import sys
+import unicodedata
 from datetime import datetime
 from contextlib import asynccontextmanager
 from collections.abc import AsyncIterator
-from dataclasses import dataclass
-from typing import Optional, Any, Dict, List
+from dataclasses import dataclass, replace
+from typing import Annotated, Optional, Any, Dict, List, Tuple, Union
 
 import httpx
+import uvicorn
 from mcp.server.fastmcp import FastMCP, Context
-from dotenv import load_dotenv
+from mcp.types import CallToolResult
 
-# Load environment variables
-load_dotenv()
+# Allow running as a script (python server/server.py) as well as a module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from common import jsoncodec
+from common.tracing import tracer
+from server.cache import HTTPCache, SingleFlight, TTLCache
+from server.coins import CoinIndex, HotCoinTicker
+from server.config import SERVER_TRANSPORTS, ConfigError, ServerConfig, describe, load_config
+from server.dictionary import DefinitionStore, DictionaryBundle
+from server.jokes import JOKE_BATCH_SIZE, JokeBuffer
+from server.jsonstream import extract_json, select_json
+from server.metrics import ToolMetrics, merge_states, prometheus_text
+from server.results import (
+    CoinPrice,
+    CryptoPricesResult,
+    DefinitionResult,
+    DictionaryEntry,
+    JokeResult,
+    NewsResult,
+    SearchResult,
+    TimeResult,
+    WeatherManyResult,
+    WeatherResult,
+    render_crypto_prices,
+    render_definition,
+    render_joke,
+    render_news,
+    render_search,
+    render_weather,
+    render_weather_many,
+    tool_error,
+    tool_result,
+)
+from server.resilience import Deadline
+from server.shared import SharedStore, SharedTTLCache
+from server.upstream import UpstreamPool, UpstreamSettings
+from server.workers import run_workers
+
+logger = logging.getLogger("universal-mcp")
+
+@dataclass
+class AppContext:
+    """Resources shared by all tools for the lifetime of the server."""
+    # Replaced as a whole on reload; tools read it once per call
+    config: ServerConfig
+    http: UpstreamPool
+    inflight: SingleFlight
+    weather_cache: Union[TTLCache, SharedTTLCache]
+    # Geocoded city coordinates (and OpenWeatherMap city ids once known); they never expire
+    locations: Union[TTLCache, SharedTTLCache]
+    search_cache: Union[TTLCache, SharedTTLCache]
+    coins: CoinIndex
+    crypto_ticker: HotCoinTicker
+    jokes: JokeBuffer
+    definitions: DefinitionStore
+    dictionary_bundle: Optional[DictionaryBundle] = None
+    # Cache tier and metrics shared with the other worker processes, if any
+    shared: Optional[SharedStore] = None
+
+# Set while serving over HTTP, where every session uses the resources of the process
+_shared_app: Optional[AppContext] = None
+
+@asynccontextmanager
+async def app_resources(config: Optional[ServerConfig] = None) -> AsyncIterator[AppContext]:
+    """
+    Open the shared upstream clients on startup and close them on shutdown.
+    
+    The configuration is loaded once here (unless given); SIGHUP reloads it in place.
+    """
+    config = config or load_config()
+    jsoncodec.set_backend(config.json_codec)
+    tracer.configure(config.trace_file, config.trace_format, service="universal-mcp-server")
+    http = UpstreamPool(
+        upstreams=config.upstream_urls,
+        settings=_upstream_settings(config),
+        http_cache=HTTPCache(maxsize=config.http_cache_size),
+    )
+    shared = SharedStore(config.shared_cache_path) if config.shared_cache_path or config.workers > 1 else None
+    if shared is None:
+        weather_cache = TTLCache(maxsize=config.weather_cache_size, ttl=config.weather_cache_ttl)
+        locations = TTLCache(maxsize=config.geocode_cache_size, ttl=float("inf"))
+        search_cache = TTLCache(maxsize=config.search_cache_size, ttl=config.search_cache_ttl)
+    else:
+        weather_cache = shared.cache("weather", maxsize=config.weather_cache_size, ttl=config.weather_cache_ttl)
+        locations = shared.cache("locations", maxsize=config.geocode_cache_size, ttl=float("inf"))
+        search_cache = shared.cache("search", maxsize=config.search_cache_size, ttl=config.search_cache_ttl)
+    coins = CoinIndex(config.coins_list_path)
+    crypto_ticker = HotCoinTicker(
+        fetch=lambda ids: _fetch_crypto_prices(http, ids, DEFAULT_CURRENCIES),
+        watchlist=[coins.resolve(s) or s.lower() for s in config.crypto_watchlist],
+        top_n=config.crypto_hot_coins,
+        interval=config.crypto_refresh_interval,
+        max_staleness=config.crypto_max_staleness,
+    )
+    crypto_ticker.start()
+    jokes = JokeBuffer(
+        fetch=lambda category: _fetch_jokes(http, category),
+        capacity=config.joke_buffer_size,
+        low_water=config.joke_low_water,
+    )
+    jokes.start()
+    definitions = DefinitionStore(path=config.dictionary_cache_path, max_entries=config.dictionary_cache_size)
+    dictionary_bundle = DictionaryBundle(config.dictionary_bundle_path) if config.dictionary_bundle_path else None
+    app = AppContext(
+        config=config,
+        http=http,
+        inflight=SingleFlight(),
+        weather_cache=weather_cache,
+        locations=locations,
+        search_cache=search_cache,
+        coins=coins,
+        crypto_ticker=crypto_ticker,
+        jokes=jokes,
+        definitions=definitions,
+        dictionary_bundle=dictionary_bundle,
+        shared=shared,
+    )
+    publisher = asyncio.create_task(_publish_metrics(app)) if config.workers > 1 else None
+    
+    loop = asyncio.get_running_loop()
+    try:
+        loop.add_signal_handler(signal.SIGHUP, _reload_config, app)
+        reload_on_hup = True
+    except (AttributeError, NotImplementedError, RuntimeError):
+        # No SIGHUP on Windows, and no signal handlers outside the main thread
+        reload_on_hup = False
+    try:
+        yield app
+    finally:
+        if reload_on_hup:
+            loop.remove_signal_handler(signal.SIGHUP)
+        if publisher is not None:
+            publisher.cancel()
+            # Leave final figures (with nothing in flight) for the workers still running
+            shared.publish_metrics(os.getpid(), _metrics_snapshot(app))
+        if shared is not None:
+            shared.close()
+        if app.dictionary_bundle is not None:
+            app.dictionary_bundle.close()
+        definitions.close()
+        await jokes.stop()
+        await crypto_ticker.stop()
+        await http.aclose()
+        tracer.close()
+
+@asynccontextmanager
+async def app_lifespan(server: FastMCP) -> AsyncIterator[AppContext]:
+    """
+    Lifespan of one MCP session.
+
+    Over stdio the session is the whole server run, so it owns the resources.
+    The HTTP transports start one session per client (or per request, with
+    several workers); those all share the resources opened once for the
+    process by _serve_http().
+    """
+    if _shared_app is not None:
+        yield _shared_app
+        return
+    async with app_resources() as app:
+        yield app
+
+def _apply_config(app: AppContext, config: ServerConfig) -> None:
+    """
+    Retune the shared resources for a new configuration without recreating them.
+    
+    Caches keep their entries and upstreams their connections and counters;
+    the new config object itself is swapped in last, in a single assignment,
+    so a tool call sees either the old or the new settings, never a mix.
+    The transport, workers, shared store, coin snapshot and dictionary database paths only apply after a restart.
+    
+    Everything that can fail (opening a new dictionary bundle or trace file)
+    happens first, so a failed reload leaves the running settings untouched.
+    
+    Raises:
+        OSError: If a new dictionary bundle or trace file cannot be opened
+        ValueError: If a new dictionary bundle is invalid
+    """
+    new_bundle = None
+    bundle_changed = config.dictionary_bundle_path != app.config.dictionary_bundle_path
+    if bundle_changed and config.dictionary_bundle_path:
+        new_bundle = DictionaryBundle(config.dictionary_bundle_path)
+    try:
+        tracer.configure(config.trace_file, config.trace_format, service="universal-mcp-server")
+    except BaseException:
+        if new_bundle is not None:
+            new_bundle.close()
+        raise
+    
+    # Nothing below can fail for a validated configuration
+    jsoncodec.set_backend(config.json_codec)
+    app.http.reconfigure(config.upstream_urls, _upstream_settings(config))
+    app.http.http_cache.resize(config.http_cache_size)
+    app.weather_cache.configure(config.weather_cache_size, config.weather_cache_ttl)
+    app.locations.configure(config.geocode_cache_size, float("inf"))
+    app.search_cache.configure(config.search_cache_size, config.search_cache_ttl)
+    
+    ticker = app.crypto_ticker
+    ticker.watchlist = list(dict.fromkeys(app.coins.resolve(s) or s.lower() for s in config.crypto_watchlist))
+    ticker.top_n = config.crypto_hot_coins
+    ticker.interval = config.crypto_refresh_interval
+    ticker.max_staleness = config.crypto_max_staleness
+    app.jokes.configure(config.joke_buffer_size, config.joke_low_water)
+    app.definitions.max_entries = config.dictionary_cache_size
+    
+    if bundle_changed:
+        old_bundle, app.dictionary_bundle = app.dictionary_bundle, new_bundle
+        if old_bundle is not None:
+            old_bundle.close()
+    
+    app.config = config
+
+def _upstream_settings(config: ServerConfig) -> Dict[str, UpstreamSettings]:
+    """Upstream settings for this process; with several workers, each gets its share of every rate limit."""
+    return {name: settings.per_worker(config.workers) for name, settings in config.upstreams.items()}
+
+def _reload_config(app: AppContext) -> None:
+    """SIGHUP handler: load the configuration again and apply it, keeping the old one if it is invalid."""
+    try:
+        # Settings that only apply after a restart keep describing the running server
+        config = replace(
+            load_config(),
+            transport=app.config.transport,
+            host=app.config.host,
+            port=app.config.port,
+            workers=app.config.workers,
+            shared_cache_path=app.config.shared_cache_path,
+        )
+        _apply_config(app, config)
+    except (ConfigError, OSError, ValueError) as e:
+        logger.error("Configuration not reloaded: %s", e)
+        return
+    logger.info("Configuration reloaded")
+
+def _app(ctx: Context) -> AppContext:
+    """Return the lifespan context of the current request."""
+    return ctx.request_context.lifespan_context
+
+def _normalize(text: str) -> str:
+    """Fold Unicode forms, whitespace and case so equivalent tool arguments compare equal."""
+    return " ".join(unicodedata.normalize("NFKC", text).split()).casefold()
+
+def _deadline(ctx: Context, tool: str) -> Deadline:
+    """Start the deadline of a tool call from the request's timeoutMs meta field or the tool's configured timeout."""
+    meta = ctx.request_context.meta
+    timeout_ms = getattr(meta, "timeoutMs", None) if meta is not None else None
+    if isinstance(timeout_ms, (int, float)) and timeout_ms > 0:
+        return Deadline(timeout_ms / 1000)
+    return Deadline(_app(ctx).config.tool(tool).timeout)
+
+async def _get_json(http: UpstreamPool, upstream: str, url: str, **kwargs: Any) -> Any:
+    """GET an upstream URL, raising for HTTP errors, and decode the JSON body."""
+    response = await http.get(upstream, url, **kwargs)
+    response.raise_for_status()
+    return jsoncodec.loads(response.content)
+
+async def _get_selected_json(http: UpstreamPool, upstream: str, url: str, array_key: str, limit: int,
+                             fields: List[str], item_fields: List[str], **kwargs: Any) -> Dict[str, Any]:
+    """
+    GET an upstream URL and decode only the given fields and the first items of one array.
+    
+    The body is still read in full so the connection can be reused and the
+    response cached. With the stdlib codec, unused sections are never kept as
+    Python objects; an accelerated codec decodes the whole body faster.
+    """
+    response = await http.get(upstream, url, **kwargs)
+    response.raise_for_status()
+    if jsoncodec.BACKEND == "json":
+        return extract_json(response.iter_bytes(), array_key, limit, fields, item_fields)
+    return select_json(jsoncodec.loads(response.content), array_key, limit, fields, item_fields)
 
 # Create the MCP server
-mcp = FastMCP("Universal MCP Server")
+mcp = FastMCP("Universal MCP Server", lifespan=app_lifespan)
+# Calls, errors and latency of every tool, kept for the lifetime of the process
+tool_metrics = ToolMetrics()
+
+def _request_traceparent() -> Optional[str]:
+    """Return the trace context the client sent in the _meta of the request being handled, if any."""
+    try:
+        meta = mcp.get_context().request_context.meta
+    except ValueError:
+        return None
+    return getattr(meta, "traceparent", None) if meta is not None else None
+
+# Runs each tool call in a server span continuing the client's trace (when TRACE_FILE is set)
+traced_tool = tracer.instrument(kind="server", parent=_request_traceparent)
 
 # ===== Weather API =====
+def _weather_cache_key(city: str, country_code: Optional[str], units: str) -> tuple:
+    """Normalize a location so that 'new  york' and 'New York' share a cache entry."""
+    return (_normalize(city), (country_code or "").strip().upper(), units)
+
+def _weather_result(city: str, data: Dict[str, Any], units: str) -> WeatherResult:
+    """Extract the reported fields from an OpenWeatherMap current weather entry."""
+    return {
+        "city": city,
+        "conditions": data["weather"][0]["description"],
+        "temperature": data["main"]["temp"],
+        "feels_like": data["main"]["feels_like"],
+        "humidity": data["main"]["humidity"],
+        "wind_speed": data["wind"]["speed"],
+        "units": units,
+    }
+
 @mcp.tool()
-async def get_weather(city: str, country_code: Optional[str] = None) -> str:
+@tool_metrics.instrument
+@traced_tool
+async def get_weather(city: str, country_code: Optional[str] = None, *,
+                      ctx: Context) -> Annotated[CallToolResult, WeatherResult]:
     """
     Get current weather information for a city.
     
@@ -38,45 +343,250 @@ async def get_weather(city: str, country_code: Optional[str] = None) -> str:
         country_code: Optional ISO 3166 country code (e.g., 'US' for United States)
     
     Returns:
-        Weather information in text format
+        Weather conditions, temperatures, humidity (%) and wind speed, in the configured units
     """
+    app = _app(ctx)
+    config = app.config
     # Using OpenWeatherMap's free API
-    api_key = os.getenv("OPENWEATHER_API_KEY", "")
-    if not api_key:
-        return "Error: OpenWeatherMap API key not configured. Please set OPENWEATHER_API_KEY environment variable."
+    if not config.openweather_api_key:
+        return tool_error("Error: OpenWeatherMap API key not configured. Please set OPENWEATHER_API_KEY environment variable.")
     
     query = f"{city},{country_code}" if country_code else city
-    url = f"https://api.openweathermap.org/data/2.5/weather?q={query}&appid={api_key}&units=metric"
+    params = {
+        "q": query,
+        "appid": config.openweather_api_key,
+        "units": config.weather_units
+    }
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url)
-            response.raise_for_status()
-            data = response.json()
-            
-            # Extract relevant information
-            weather_desc = data["weather"][0]["description"]
-            temp = data["main"]["temp"]
-            feels_like = data["main"]["feels_like"]
-            humidity = data["main"]["humidity"]
-            wind_speed = data["wind"]["speed"]
-            
-            return f"""Weather in {city}:
-- Conditions: {weather_desc}
-- Temperature: {temp}°C (feels like {feels_like}°C)
-- Humidity: {humidity}%
-- Wind Speed: {wind_speed} m/s
-"""
-        except httpx.HTTPStatusError as e:
-            if e.response.status_code == 404:
-                return f"City not found: {city}"
-            return f"Error fetching weather data: {str(e)}"
-        except Exception as e:
-            return f"An unexpected error occurred: {str(e)}"
+    deadline = _deadline(ctx, "get_weather")
+    cache_key = _weather_cache_key(city, country_code, config.weather_units)
+    
+    try:
+        data = app.weather_cache.get(cache_key)
+        if data is None:
+            data = await deadline.wait(app.inflight.do(
+                ("get_weather", cache_key),
+                lambda: _get_json(app.http, "openweathermap", "/data/2.5/weather", deadline=deadline, params=params),
+                deadline=deadline
+            ), "get_weather")
+            app.weather_cache.set(cache_key, data)
+        
+        weather = _weather_result(city, data, config.weather_units)
+        return tool_result(weather, render_weather(weather))
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 404:
+            return tool_error(f"City not found: {city}")
+        return tool_error(f"Error fetching weather data: {str(e)}")
+    except Exception as e:
+        return tool_error(f"An unexpected error occurred: {str(e)}")
+
+# Most city ids the OpenWeatherMap group endpoint accepts per request
+WEATHER_GROUP_SIZE = 20
+
+def _split_location(location: str) -> Tuple[str, Optional[str]]:
+    """Split 'Paris, FR' into the city and its two-letter country code (None if not given)."""
+    city, sep, country = location.rpartition(",")
+    if sep and city.strip() and len(country.strip()) == 2:
+        return city.strip(), country.strip()
+    return location.strip(), None
+
+def _location_key(city: str, country_code: Optional[str]) -> tuple:
+    """Normalize a city for the geocoding cache."""
+    return (_normalize(city), (country_code or "").upper())
+
+async def _geocode(app: AppContext, config: ServerConfig, city: str, country_code: Optional[str],
+                   deadline: Deadline) -> Optional[Dict[str, Any]]:
+    """Resolve a city to coordinates, remembering the answer for the lifetime of the server."""
+    key = _location_key(city, country_code)
+    location = app.locations.get(key)
+    if location is None:
+        params = {
+            "q": f"{city},{country_code}" if country_code else city,
+            "limit": 1,
+            "appid": config.openweather_api_key,
+        }
+        matches = await app.inflight.do(
+            ("geocode", key),
+            lambda: _get_json(app.http, "openweathermap", "/geo/1.0/direct", deadline=deadline, params=params),
+            deadline=deadline
+        )
+        if not matches:
+            return None
+        location = {"lat": matches[0]["lat"], "lon": matches[0]["lon"]}
+        app.locations.set(key, location)
+    return location
+
+async def _fetch_weather_many(app: AppContext, config: ServerConfig, places: List[str],
+                              deadline: Deadline) -> Dict[str, Any]:
+    """
+    Fetch current weather for several locations with as few requests as possible.
+    
+    Fresh cached answers are used first. The rest are geocoded (once per
+    city), then cities whose OpenWeatherMap id is known are fetched together
+    through the group endpoint and the others by coordinates, which also
+    teaches us their id for next time. At most WEATHER_CONCURRENCY requests
+    run at once.
+    
+    Returns:
+        For each location its weather entry, None if the city was not found,
+        or the exception that prevented fetching it
+    """
+    units = config.weather_units
+    slots = asyncio.Semaphore(config.weather_concurrency)
+    results: Dict[str, Any] = {}
+    
+    async def bounded(awaitable):
+        async with slots:
+            return await awaitable
+    
+    def store(place: str, data: Dict[str, Any]) -> None:
+        results[place] = data
+        app.weather_cache.set(_weather_cache_key(*_split_location(place), units), data)
+    
+    pending = []
+    for place in places:
+        data = app.weather_cache.get(_weather_cache_key(*_split_location(place), units))
+        if data is None:
+            pending.append(place)
+        else:
+            results[place] = data
+    
+    geocoded = await asyncio.gather(
+        *(bounded(_geocode(app, config, *_split_location(place), deadline)) for place in pending),
+        return_exceptions=True,
+    )
+    located: Dict[str, Dict[str, Any]] = {}
+    for place, location in zip(pending, geocoded):
+        if isinstance(location, dict):
+            located[place] = location
+        else:
+            results[place] = location
+    
+    by_coordinates = [place for place, location in located.items() if "id" not in location]
+    known = [place for place, location in located.items() if "id" in location]
+    groups = [known[i:i + WEATHER_GROUP_SIZE] for i in range(0, len(known), WEATHER_GROUP_SIZE)]
+    replies = await asyncio.gather(*(bounded(_get_json(
+        app.http, "openweathermap", "/data/2.5/group", deadline=deadline, params={
+            "id": ",".join(str(located[place]["id"]) for place in group),
+            "units": units,
+            "appid": config.openweather_api_key,
+        }
+    )) for group in groups), return_exceptions=True)
+    for group, reply in zip(groups, replies):
+        by_id = {item["id"]: item for item in reply.get("list", [])} if isinstance(reply, dict) else {}
+        for place in group:
+            data = by_id.get(located[place]["id"])
+            if data is None:
+                # Group endpoint unavailable or city missing from the reply
+                by_coordinates.append(place)
+            else:
+                store(place, data)
+    
+    replies = await asyncio.gather(*(bounded(_get_json(
+        app.http, "openweathermap", "/data/2.5/weather", deadline=deadline, params={
+            "lat": located[place]["lat"],
+            "lon": located[place]["lon"],
+            "units": units,
+            "appid": config.openweather_api_key,
+        }
+    )) for place in by_coordinates), return_exceptions=True)
+    for place, reply in zip(by_coordinates, replies):
+        if isinstance(reply, Exception):
+            results[place] = reply
+            continue
+        if reply.get("id"):
+            located[place]["id"] = reply["id"]
+            # Store it again, as the shared cache tier does not see changes made in place
+            app.locations.set(_location_key(*_split_location(place)), located[place])
+        store(place, reply)
+    return results
+
+@mcp.tool()
+@tool_metrics.instrument
+@traced_tool
+async def get_weather_many(locations: List[str], *, ctx: Context) -> Annotated[CallToolResult, WeatherManyResult]:
+    """
+    Get current weather for several cities at once.
+    
+    Args:
+        locations: City names, each optionally followed by an ISO 3166 country code (e.g., ['Paris, FR', 'Tokyo'])
+    
+    Returns:
+        One row per city with conditions, temperatures, humidity (%) and wind speed, in the configured units
+    """
+    app = _app(ctx)
+    config = app.config
+    if not config.openweather_api_key:
+        return tool_error("Error: OpenWeatherMap API key not configured. Please set OPENWEATHER_API_KEY environment variable.")
+    
+    # Deduplicate while keeping the order the caller asked for
+    places = list(dict.fromkeys(" ".join(location.split()) for location in locations if location.strip()))
+    if not places:
+        return tool_error("Error: No locations given.")
+    max_count = config.tool("get_weather_many").max_count
+    if len(places) > max_count:
+        return tool_error(f"Error: At most {max_count} locations can be requested at once.")
+    
+    try:
+        deadline = _deadline(ctx, "get_weather_many")
+        data = await deadline.wait(_fetch_weather_many(app, config, places, deadline), "get_weather_many")
+    except Exception as e:
+        return tool_error(f"Error fetching weather data: {str(e)}")
+    
+    rows: List[WeatherResult] = []
+    for place in places:
+        city, _ = _split_location(place)
+        entry = data.get(place)
+        if isinstance(entry, dict):
+            rows.append(_weather_result(city, entry, config.weather_units))
+        elif entry is None:
+            rows.append({"city": city, "error": "City not found"})
+        else:
+            rows.append({"city": city, "error": f"Error fetching weather data: {str(entry)}"})
+    weather: WeatherManyResult = {"units": config.weather_units, "locations": rows}
+    return tool_result(weather, render_weather_many(weather))
 
 # ===== Cryptocurrency API =====
+# Currencies quoted by get_crypto_price and kept fresh by the hot-coin ticker
+DEFAULT_CURRENCIES = ["usd", "eur"]
+
+def _coin_price(coin_id: str, crypto_data: Dict[str, Any], currencies: List[str]) -> CoinPrice:
+    """Pick the requested currencies out of a CoinGecko price entry (24h change is for the first one)."""
+    return {
+        "id": coin_id,
+        "prices": {currency: crypto_data.get(currency) for currency in currencies},
+        "change_24h": crypto_data.get(f"{currencies[0]}_24h_change"),
+    }
+
+def _resolve_coin(ctx: Context, symbol: str) -> str:
+    """Map a ticker or name to its CoinGecko id, passing unknown coins through as ids."""
+    symbol = symbol.strip()
+    return _app(ctx).coins.resolve(symbol) or symbol.lower()
+
+def _coin_not_found(ctx: Context, prices: CryptoPricesResult, symbols: List[str]) -> None:
+    """Record coins that were not found, suggesting known coins with a matching prefix."""
+    tried = {_resolve_coin(ctx, symbol) for symbol in symbols}
+    suggestions = [coin_id for symbol in symbols for coin_id in _app(ctx).coins.suggest(symbol)
+                   if coin_id not in tried]
+    prices["not_found"] = symbols
+    prices["suggestions"] = list(dict.fromkeys(suggestions))
+
+async def _fetch_crypto_prices(http: UpstreamPool, ids: List[str], currencies: List[str],
+                               deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    """Fetch prices of several coins in several currencies with one CoinGecko request."""
+    params = {
+        "ids": ",".join(ids),
+        "vs_currencies": ",".join(currencies),
+        "include_24hr_change": "true"
+    }
+    response = await http.get("coingecko", "/api/v3/simple/price", deadline=deadline, params=params)
+    response.raise_for_status()
+    return jsoncodec.loads(response.content)
+
 @mcp.tool()
-async def get_crypto_price(symbol: str) -> str:
+@tool_metrics.instrument
+@traced_tool
+async def get_crypto_price(symbol: str, *, ctx: Context) -> Annotated[CallToolResult, CryptoPricesResult]:
     """
     Get the current price of a cryptocurrency.
     
@@ -84,62 +594,108 @@ async def get_crypto_price(symbol: str) -> str:
         symbol: Cryptocurrency symbol (e.g., BTC, ETH, SOL)
     
     Returns:
-        Current price information
+        Current price in USD and EUR and the 24h change (%)
     """
     # Using CoinGecko's free API
-    symbol = symbol.lower()
-    url = f"https://api.coingecko.com/api/v3/simple/price?ids={symbol}&vs_currencies=usd,eur&include_24hr_change=true"
+    app = _app(ctx)
+    deadline = _deadline(ctx, "get_crypto_price")
+    coin_id = _resolve_coin(ctx, symbol)
+    prices: CryptoPricesResult = {"currencies": DEFAULT_CURRENCIES, "coins": []}
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url)
-            response.raise_for_status()
-            data = response.json()
+    try:
+        # Hot coins are answered from memory, refreshed in the background
+        crypto_data = app.crypto_ticker.get(coin_id)
+        if crypto_data is None:
+            data = await deadline.wait(app.inflight.do(
+                ("get_crypto_price", coin_id),
+                lambda: _fetch_crypto_prices(app.http, [coin_id], DEFAULT_CURRENCIES, deadline),
+                deadline=deadline
+            ), "get_crypto_price")
             
-            if not data or symbol not in data:
-                return f"Cryptocurrency not found: {symbol}. Try using the full name (e.g., 'bitcoin' instead of 'BTC')."
+            if not data or coin_id not in data:
+                _coin_not_found(ctx, prices, [symbol])
+                return tool_result(prices, render_crypto_prices(prices))
             
-            crypto_data = data[symbol]
-            usd_price = crypto_data.get("usd", "N/A")
-            eur_price = crypto_data.get("eur", "N/A")
-            change_24h = crypto_data.get("usd_24h_change", "N/A")
-            
-            if change_24h != "N/A":
-                change_24h = f"{change_24h:.2f}%"
-            
-            return f"""Current {symbol.upper()} price:
-- USD: ${usd_price}
-- EUR: €{eur_price}
-- 24h Change: {change_24h}
-"""
-        except Exception as e:
-            return f"Error fetching cryptocurrency data: {str(e)}"
+            app.crypto_ticker.update(data)
+            crypto_data = data[coin_id]
+        
+        app.crypto_ticker.record(coin_id)
+        prices["coins"].append(_coin_price(coin_id, crypto_data, DEFAULT_CURRENCIES))
+        return tool_result(prices, render_crypto_prices(prices))
+    except Exception as e:
+        return tool_error(f"Error fetching cryptocurrency data: {str(e)}")
+
+@mcp.tool()
+@tool_metrics.instrument
+@traced_tool
+async def get_crypto_prices(symbols: List[str], currencies: Optional[List[str]] = None, *,
+                            ctx: Context) -> Annotated[CallToolResult, CryptoPricesResult]:
+    """
+    Get the current prices of several cryptocurrencies in one request.
+    
+    Args:
+        symbols: Cryptocurrency symbols (e.g., ['BTC', 'ETH', 'SOL'])
+        currencies: Currencies to quote prices in (default: ['usd', 'eur'])
+    
+    Returns:
+        Current prices and 24h change (%, in the first currency) for each cryptocurrency
+    """
+    # Deduplicate while keeping the order the caller asked for
+    ids = list(dict.fromkeys(_resolve_coin(ctx, s) for s in symbols if s.strip()))
+    currencies = list(dict.fromkeys(c.strip().lower() for c in currencies or [] if c.strip())) or DEFAULT_CURRENCIES
+    if not ids:
+        return tool_error("Error: No cryptocurrency symbols given.")
+    
+    try:
+        app = _app(ctx)
+        deadline = _deadline(ctx, "get_crypto_prices")
+        data = await deadline.wait(app.inflight.do(
+            ("get_crypto_prices", tuple(ids), tuple(currencies)),
+            lambda: _fetch_crypto_prices(app.http, ids, currencies, deadline),
+            deadline=deadline
+        ), "get_crypto_prices")
+        
+        prices: CryptoPricesResult = {
+            "currencies": currencies,
+            "coins": [_coin_price(coin_id, data[coin_id], currencies) for coin_id in ids if coin_id in data],
+        }
+        missing = [coin_id for coin_id in ids if coin_id not in data]
+        if missing:
+            _coin_not_found(ctx, prices, missing)
+        
+        return tool_result(prices, render_crypto_prices(prices))
+    except Exception as e:
+        return tool_error(f"Error fetching cryptocurrency data: {str(e)}")
 
 # ===== News API =====
 @mcp.tool()
-async def get_news_headlines(topic: str = "", country: str = "us", count: int = 5) -> str:
+@tool_metrics.instrument
+@traced_tool
+async def get_news_headlines(topic: str = "", country: str = "us", count: int = 5, *,
+                             ctx: Context) -> Annotated[CallToolResult, NewsResult]:
     """
     Get top news headlines, optionally filtered by topic.
     
     Args:
         topic: Topic to filter headlines (optional)
         country: Country code (default: 'us')
-        count: Number of headlines to return (default: 5, max: 10)
+        count: Number of headlines to return (default: 5, max: 10 unless configured otherwise)
     
     Returns:
-        News headlines in text format
+        News headlines with source, publication time and URL
     """
+    app = _app(ctx)
+    config = app.config
     # Using NewsAPI's free tier
-    api_key = os.getenv("NEWSAPI_KEY", "")
-    if not api_key:
-        return "Error: NewsAPI key not configured. Please set NEWSAPI_KEY environment variable."
+    if not config.newsapi_key:
+        return tool_error("Error: NewsAPI key not configured. Please set NEWSAPI_KEY environment variable.")
     
     # Enforce maximum count
-    count = min(count, 10)
+    count = min(count, config.tool("get_news_headlines").max_count)
     
     # Construct URL
     params = {
-        "apiKey": api_key,
+        "apiKey": config.newsapi_key,
         "country": country,
         "pageSize": count
     }
@@ -147,43 +703,51 @@ async def get_news_headlines(topic: str = "", country: str = "us", count: int =
     if topic:
         params["q"] = topic
     
-    url = "https://newsapi.org/v2/top-headlines"
+    deadline = _deadline(ctx, "get_news_headlines")
+    flight_key = ("get_news_headlines", _normalize(topic), country.lower(), count)
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data["status"] != "ok":
-                return f"Error: {data.get('message', 'Unknown error')}"
-            
-            articles = data["articles"]
-            if not articles:
-                return f"No news found for the given criteria."
-            
-            result = f"Top {len(articles)} news headlines"
-            if topic:
-                result += f" about '{topic}'"
-            result += ":\n\n"
-            
-            for i, article in enumerate(articles, 1):
-                pub_date = article.get("publishedAt", "").split("T")[0]
-                result += f"{i}. {article['title']}\n"
-                result += f"   Source: {article.get('source', {}).get('name', 'Unknown')}\n"
-                if pub_date:
-                    result += f"   Date: {pub_date}\n"
-                if article.get("url"):
-                    result += f"   URL: {article['url']}\n"
-                result += "\n"
-            
-            return result.strip()
-        except Exception as e:
-            return f"Error fetching news data: {str(e)}"
+    try:
+        data = await deadline.wait(app.inflight.do(
+            flight_key,
+            lambda: _get_selected_json(
+                app.http, "newsapi", "/v2/top-headlines", "articles", count,
+                ["status", "message"], ["title", "source", "publishedAt", "url"], deadline=deadline, params=params
+            ),
+            deadline=deadline
+        ), "get_news_headlines")
+        
+        if data.get("status") != "ok":
+            return tool_error(f"Error: {data.get('message', 'Unknown error')}")
+        
+        news: NewsResult = {
+            "topic": topic,
+            "articles": [
+                {
+                    "title": article.get("title") or "",
+                    "source": (article.get("source") or {}).get("name") or "Unknown",
+                    "published_at": article.get("publishedAt") or "",
+                    "url": article.get("url") or "",
+                }
+                for article in data.get("articles", [])
+            ],
+        }
+        return tool_result(news, render_news(news))
+    except Exception as e:
+        return tool_error(f"Error fetching news data: {str(e)}")
 
 # ===== Joke API =====
+async def _fetch_jokes(http: UpstreamPool, category: str) -> List[Dict[str, Any]]:
+    """Fetch a batch of jokes from one JokeAPI category (safe mode, so jokes are SFW)."""
+    data = await _get_json(http, "jokeapi", f"/joke/{category}?safe-mode&amount={JOKE_BATCH_SIZE}")
+    if data.get("error"):
+        raise ValueError(data.get("message", "Unknown error"))
+    # A single joke is returned unwrapped when only one matches
+    return data["jokes"] if "jokes" in data else [data]
+
 @mcp.tool()
-async def get_random_joke(category: Optional[str] = None) -> str:
+@tool_metrics.instrument
+@traced_tool
+async def get_random_joke(category: Optional[str] = None, *, ctx: Context) -> Annotated[CallToolResult, JokeResult]:
     """
     Get a random joke, optionally from a specific category.
     
@@ -191,94 +755,127 @@ async def get_random_joke(category: Optional[str] = None) -> str:
         category: Joke category (optional - 'programming', 'misc', 'dark', 'pun', 'spooky', 'christmas')
     
     Returns:
-        A random joke
+        A single-line joke, or a setup and its delivery
     """
-    url = "https://v2.jokeapi.dev/joke/"
-    
-    if category:
-        url += category
-    else:
-        url += "Any"
+    key = (category or "").strip().lower() or "any"
     
-    url += "?safe-mode"  # Ensure jokes are SFW
-    
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data.get("error"):
-                return f"Error: {data.get('message', 'Unknown error')}"
-            
-            if data["type"] == "single":
-                return data["joke"]
-            else:
-                return f"{data['setup']}\n\n{data['delivery']}"
-        except Exception as e:
-            return f"Error fetching joke: {str(e)}"
+    try:
+        # Served from the prefetched buffer; only an empty buffer waits for JokeAPI
+        deadline = _deadline(ctx, "get_random_joke")
+        data = await deadline.wait(_app(ctx).jokes.get(key), "get_random_joke")
+        
+        joke: JokeResult = {"category": data.get("category", category or "Any")}
+        if data["type"] == "single":
+            joke["joke"] = data["joke"]
+        else:
+            joke["setup"] = data["setup"]
+            joke["delivery"] = data["delivery"]
+        return tool_result(joke, render_joke(joke))
+    except Exception as e:
+        return tool_error(f"Error fetching joke: {str(e)}")
 
 # ===== Web Search API =====
+def _cached_search(app: AppContext, key: str, count: int) -> Optional[Dict[str, Any]]:
+    """
+    Return cached results for a normalized query if they cover count results.
+    
+    A result set fetched for a larger count serves any smaller one, and one
+    that came back with fewer results than asked for is complete for any count.
+    """
+    def covers(entry: Any) -> bool:
+        fetched, data = entry
+        return count <= fetched or len(data.get("organic_results", [])) < fetched
+
+    # A set too small for count is a miss, not a hit: it gets fetched again
+    entry = app.search_cache.get(key, accept=covers)
+    return entry[1] if entry is not None else None
+
 @mcp.tool()
-async def web_search(query: str, count: int = 5) -> str:
+@tool_metrics.instrument
+@traced_tool
+async def web_search(query: str, count: int = 5, *, ctx: Context) -> Annotated[CallToolResult, SearchResult]:
     """
     Search the web for information.
     
     Args:
         query: Search query
-        count: Number of results to return (default: 5, max: 10)
+        count: Number of results to return (default: 5, max: 10 unless configured otherwise)
     
     Returns:
-        Search results in text format
+        Search results with title, snippet and link
     """
+    app = _app(ctx)
+    config = app.config
     # Using SerpApi's free tier
-    api_key = os.getenv("SERPAPI_KEY", "")
-    if not api_key:
-        return "Error: SerpAPI key not configured. Please set SERPAPI_KEY environment variable."
+    if not config.serpapi_key:
+        return tool_error("Error: SerpAPI key not configured. Please set SERPAPI_KEY environment variable.")
     
     # Enforce maximum count
-    count = min(count, 10)
+    count = min(count, config.tool("web_search").max_count)
     
     # Construct URL
     params = {
-        "api_key": api_key,
+        "api_key": config.serpapi_key,
         "q": query,
         "num": count,
         "engine": "google"
     }
     
-    url = "https://serpapi.com/search"
+    deadline = _deadline(ctx, "web_search")
+    cache_key = _normalize(query)
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
+    try:
+        data = _cached_search(app, cache_key, count)
+        if data is None:
+            data = await deadline.wait(app.inflight.do(
+                ("web_search", cache_key, count),
+                lambda: _get_selected_json(
+                    app.http, "serpapi", "/search", "organic_results", count,
+                    ["error"], ["title", "snippet", "link"], deadline=deadline, params=params
+                ),
+                deadline=deadline
+            ), "web_search")
             
             if "error" in data:
-                return f"Error: {data.get('error', 'Unknown error')}"
+                return tool_error(f"Error: {data.get('error', 'Unknown error')}")
             
-            organic_results = data.get("organic_results", [])
-            if not organic_results:
-                return "No search results found."
-            
-            result = f"Search results for '{query}':\n\n"
-            
-            for i, item in enumerate(organic_results[:count], 1):
-                result += f"{i}. {item.get('title', 'No title')}\n"
-                if item.get("snippet"):
-                    result += f"   {item['snippet']}\n"
-                if item.get("link"):
-                    result += f"   URL: {item['link']}\n"
-                result += "\n"
-            
-            return result.strip()
-        except Exception as e:
-            return f"Error performing web search: {str(e)}"
+            app.search_cache.set(cache_key, (count, data))
+        
+        search: SearchResult = {
+            "query": query,
+            "results": [
+                {"title": item.get("title") or "", "snippet": item.get("snippet") or "", "link": item.get("link") or ""}
+                for item in data.get("organic_results", [])[:count]
+            ],
+        }
+        return tool_result(search, render_search(search))
+    except Exception as e:
+        return tool_error(f"Error performing web search: {str(e)}")
 
 # ===== Dictionary API =====
+def _dictionary_entry(entry: Dict[str, Any]) -> DictionaryEntry:
+    """Keep the meanings and the first written pronunciation of a dictionaryapi.dev entry."""
+    result: DictionaryEntry = {
+        "meanings": [
+            {
+                "part_of_speech": meaning.get("partOfSpeech", ""),
+                "definitions": [
+                    {k: definition[k] for k in ("definition", "example") if definition.get(k)}
+                    for definition in meaning.get("definitions", [])
+                ],
+            }
+            for meaning in entry.get("meanings", [])
+        ]
+    }
+    pronunciation = next((p["text"] for p in entry.get("phonetics") or [] if p.get("text")), None)
+    if pronunciation:
+        result["pronunciation"] = pronunciation
+    return result
+
 @mcp.tool()
-async def define_word(word: str) -> str:
+@tool_metrics.instrument
+@traced_tool
+async def define_word(word: str, *, ctx: Context) -> Annotated[CallToolResult, DefinitionResult]:
     """
     Get the definition of a word.
     
@@ -286,53 +883,47 @@ async def define_word(word: str) -> str:
         word: The word to define
     
     Returns:
-        Word definition(s)
+        Definitions grouped by part of speech, with examples and pronunciation
     """
     # Using Free Dictionary API
-    url = f"https://api.dictionaryapi.dev/api/v2/entries/en/{word}"
+    url = f"/api/v2/entries/en/{word}"
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url)
-            response.raise_for_status()
-            data = response.json()
-            
-            if not data or isinstance(data, dict) and "title" in data:
-                return f"No definition found for '{word}'."
-            
-            result = f"Definitions for '{word}':\n\n"
-            
-            for entry in data:
-                if "meanings" in entry:
-                    for meaning in entry["meanings"]:
-                        part_of_speech = meaning.get("partOfSpeech", "")
-                        result += f"Part of Speech: {part_of_speech}\n"
-                        
-                        for i, definition in enumerate(meaning.get("definitions", []), 1):
-                            result += f"{i}. {definition.get('definition', '')}\n"
-                            
-                            if definition.get("example"):
-                                result += f"   Example: \"{definition['example']}\"\n"
-                            
-                            result += "\n"
-                
-                if "phonetics" in entry and entry["phonetics"]:
-                    for phonetic in entry["phonetics"]:
-                        if phonetic.get("text"):
-                            result += f"Pronunciation: {phonetic['text']}\n"
-                            break
-            
-            return result.strip()
-        except httpx.HTTPStatusError as e:
-            if e.response.status_code == 404:
-                return f"No definition found for '{word}'."
-            return f"Error fetching definition: {str(e)}"
-        except Exception as e:
-            return f"An unexpected error occurred: {str(e)}"
+    app = _app(ctx)
+    deadline = _deadline(ctx, "define_word")
+    key = _normalize(word)
+    not_found: DefinitionResult = {"word": word, "entries": []}
+    
+    try:
+        # Offline bundle first, then the persistent store, then the network
+        data = app.dictionary_bundle.get(key) if app.dictionary_bundle else None
+        if data is None:
+            data = app.definitions.get(key)
+        if data is None:
+            data = await deadline.wait(app.inflight.do(
+                ("define_word", key),
+                lambda: _get_json(app.http, "dictionaryapi", url, deadline=deadline),
+                deadline=deadline
+            ), "define_word")
+            if data and isinstance(data, list):
+                app.definitions.put(key, data)
+        
+        if not data or isinstance(data, dict) and "title" in data:
+            return tool_result(not_found, render_definition(not_found))
+        
+        definition: DefinitionResult = {"word": word, "entries": [_dictionary_entry(entry) for entry in data]}
+        return tool_result(definition, render_definition(definition))
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 404:
+            return tool_result(not_found, render_definition(not_found))
+        return tool_error(f"Error fetching definition: {str(e)}")
+    except Exception as e:
+        return tool_error(f"An unexpected error occurred: {str(e)}")
 
 # ===== Current Time and Date =====
 @mcp.tool()
-def get_current_time(timezone: str = "UTC") -> str:
+@tool_metrics.instrument
+@traced_tool
+def get_current_time(timezone: str = "UTC") -> Annotated[CallToolResult, TimeResult]:
     """
     Get the current time and date.
     
@@ -340,18 +931,204 @@ def get_current_time(timezone: str = "UTC") -> str:
         timezone: Timezone (currently only supports 'UTC' or 'local')
     
     Returns:
-        Current time and date information
+        Current time (ISO 8601) and the timezone it is given in
     """
-    now = datetime.now()
-    utc_now = datetime.utcnow()
-    
     if timezone.lower() == "local":
+        now = datetime.now()
+        current: TimeResult = {"time": now.isoformat(timespec="seconds"), "timezone": "local"}
         time_str = now.strftime("%Y-%m-%d %H:%M:%S (Local Time)")
     else:
-        time_str = utc_now.strftime("%Y-%m-%d %H:%M:%S (UTC)")
+        now = datetime.utcnow()
+        current = {"time": now.isoformat(timespec="seconds"), "timezone": "UTC"}
+        time_str = now.strftime("%Y-%m-%d %H:%M:%S (UTC)")
+    
+    return tool_result(current, f"Current time: {time_str}")
+
+# ===== Server Statistics =====
+@mcp.resource("metrics://upstreams", mime_type="application/json")
+def upstream_metrics() -> str:
+    """Connection pool occupancy, wait time and reuse ratio for each upstream API."""
+    return jsoncodec.dumps(_app(mcp.get_context()).http.stats(), indent=True)
+
+@mcp.resource("metrics://caches", mime_type="application/json")
+def cache_metrics() -> str:
+    """Hit, miss and eviction counters of the tool response caches."""
+    app = _app(mcp.get_context())
+    return jsoncodec.dumps({
+        "weather": app.weather_cache.stats(),
+        "locations": app.locations.stats(),
+        "search": app.search_cache.stats(),
+        "crypto_ticker": app.crypto_ticker.stats(),
+        "jokes": app.jokes.stats(),
+        "coalescing": app.inflight.stats(),
+        "http": app.http.http_cache.stats(),
+        "definitions": app.definitions.stats(),
+        "dictionary_bundle": app.dictionary_bundle.stats() if app.dictionary_bundle else None,
+    }, indent=True)
+
+def _cache_hit_counts(app: AppContext) -> Dict[str, List[int]]:
+    """Hits and lookups of every cache in front of an upstream."""
+    counts = {
+        name: [cache.hits, cache.hits + cache.misses]
+        for name, cache in (("weather", app.weather_cache), ("locations", app.locations),
+                            ("search", app.search_cache), ("definitions", app.definitions))
+    }
+    # Revalidated and stale-served lookups also avoided downloading the body again
+    http = app.http.http_cache
+    counts["http"] = [http.fresh_hits + http.revalidated + http.stale_served, http.fresh_hits + http.stale + http.misses]
+    counts["jokes"] = [app.jokes.served - app.jokes.misses, app.jokes.served]
+    return counts
+
+def _metrics_snapshot(app: AppContext) -> Dict[str, Any]:
+    """Raw counters of this process, in the form other workers can add up."""
+    return {
+        "tools": {name: stats.state() for name, stats in tool_metrics.tools.items()},
+        "upstreams": {name: stats.state() for name, stats in app.http.call_stats().items()},
+        "caches": _cache_hit_counts(app),
+    }
+
+async def _publish_metrics(app: AppContext, interval: float = 5.0) -> None:
+    """Publish this worker's metrics snapshot to the shared store every interval seconds."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            app.shared.publish_metrics(os.getpid(), _metrics_snapshot(app))
+        except Exception as e:
+            logger.warning(f"Error publishing metrics: {str(e)}")
+
+def _server_metrics(app: AppContext) -> Tuple[int, bool, Dict[str, Any], Dict[str, Any], Dict[str, float]]:
+    """
+    Return the number of workers, whether some are missing, CallStats per tool and per upstream, and cache hit ratios.
     
-    return f"Current time: {time_str}"
+    With several workers, the latest snapshots of all of them are added up;
+    if the shared store is locked, only this worker's figures are reported.
+    """
+    snapshot = _metrics_snapshot(app)
+    snapshots = [snapshot]
+    partial = False
+    if app.config.workers > 1:
+        try:
+            app.shared.publish_metrics(os.getpid(), snapshot)
+            published = app.shared.worker_metrics()
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Metrics of the other workers unavailable: {str(e)}")
+            partial = True
+        else:
+            published[os.getpid()] = snapshot
+            snapshots = list(published.values())
+    
+    hits: Dict[str, List[int]] = {}
+    for s in snapshots:
+        for name, (cache_hits, lookups) in s["caches"].items():
+            total = hits.setdefault(name, [0, 0])
+            total[0] += cache_hits
+            total[1] += lookups
+    return (
+        len(snapshots),
+        partial,
+        merge_states(s["tools"] for s in snapshots),
+        merge_states(s["upstreams"] for s in snapshots),
+        {name: cache_hits / lookups if lookups else 0.0 for name, (cache_hits, lookups) in hits.items()},
+    )
+
+@mcp.resource("metrics://server", mime_type="application/json")
+def server_metrics() -> str:
+    """Calls, errors, in-flight calls and p50/p90/p99 latency per tool and upstream, plus cache hit ratios (all workers)."""
+    workers, partial, tools, upstreams, cache_ratios = _server_metrics(_app(mcp.get_context()))
+    return jsoncodec.dumps({
+        "workers": workers,
+        "partial": partial,
+        "tools": {name: stats.as_dict() for name, stats in tools.items()},
+        "upstreams": {name: stats.as_dict() for name, stats in upstreams.items()},
+        "cache_hit_ratios": cache_ratios,
+    }, indent=True)
+
+@mcp.resource("metrics://server/prometheus", mime_type="text/plain")
+def server_metrics_prometheus() -> str:
+    """The metrics://server figures in the Prometheus text format, with full latency histograms."""
+    _, _, tools, upstreams, cache_ratios = _server_metrics(_app(mcp.get_context()))
+    return prometheus_text(tools, upstreams, cache_ratios)
+
+@mcp.resource("config://server", mime_type="application/json")
+def server_config() -> str:
+    """Active configuration (API keys masked); reflects the last successful SIGHUP reload."""
+    return jsoncodec.dumps(describe(_app(mcp.get_context()).config), indent=True)
 
 # Run the server when executed directly
+async def _serve_http(config: ServerConfig, sock: Optional[socket.socket] = None) -> None:
+    """Serve MCP sessions over SSE or streamable HTTP until interrupted (on sock, if given, as one of several workers)."""
+    global _shared_app
+    async with app_resources(config) as app:
+        _shared_app = app
+        try:
+            starlette_app = mcp.sse_app() if config.transport == "sse" else mcp.streamable_http_app()
+            server = uvicorn.Server(uvicorn.Config(
+                starlette_app, host=config.host, port=config.port, log_level=mcp.settings.log_level.lower()
+            ))
+            await server.serve(sockets=[sock] if sock is not None else None)
+        finally:
+            _shared_app = None
+
+def _forget_worker(config: ServerConfig, pid: int) -> None:
+    """Remove the metrics snapshot of a dead worker (the parent keeps no database open across forks)."""
+    shared = SharedStore(config.shared_cache_path)
+    try:
+        shared.forget_worker(pid)
+    finally:
+        shared.close()
+
+def main() -> None:
+    """Run the server over stdio, or over HTTP for many concurrent clients."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Universal MCP Server")
+    parser.add_argument("--transport", "-t", choices=SERVER_TRANSPORTS,
+                        help="stdio (one client, the default), sse or streamable-http (default: SERVER_TRANSPORT)")
+    parser.add_argument("--host", help="Address to listen on with the HTTP transports (default: SERVER_HOST or 127.0.0.1)")
+    parser.add_argument("--port", type=int, help="Port to listen on with the HTTP transports (default: SERVER_PORT or 8000)")
+    parser.add_argument("--workers", "-w", type=int,
+                        help="Worker processes serving streamable HTTP on one socket (default: SERVER_WORKERS or 1)")
+    args = parser.parse_args()
+
+    try:
+        config = load_config()
+    except ConfigError as e:
+        parser.exit(2, f"{e}\n")
+    # Command line options take precedence over the configuration
+    config = replace(
+        config,
+        transport=args.transport or config.transport,
+        host=args.host or config.host,
+        port=args.port or config.port,
+        workers=args.workers or config.workers,
+    )
+    if config.workers > 1 and config.transport != "streamable-http":
+        parser.error("several workers need the streamable-http transport")
+    if config.workers > 1 and not hasattr(os, "fork"):
+        parser.error("several workers are not supported on this platform")
+    if config.transport == "stdio":
+        mcp.run()
+        return
+
+    mcp.settings.host = config.host
+    mcp.settings.port = config.port
+    if config.host not in ("127.0.0.1", "localhost", "::1"):
+        # FastMCP only accepts localhost Host headers by default, which would reject remote clients
+        mcp.settings.transport_security = None
+    if config.workers == 1:
+        logger.info(f"Serving MCP over {config.transport} on {config.host}:{config.port}")
+        asyncio.run(_serve_http(config))
+        return
+
+    # A session cannot follow its client from one worker to the next, so every request stands alone
+    mcp.settings.stateless_http = True
+    sock = uvicorn.Config(None, host=config.host, port=config.port).bind_socket()
+    shared = SharedStore(config.shared_cache_path)
+    shared.reset_metrics()
+    shared.close()
+    logger.info(f"Serving MCP over {config.transport} on {config.host}:{config.port} with {config.workers} workers")
+    run_workers(config.workers, sock, lambda sock: asyncio.run(_serve_http(config, sock)),
+                on_exit=lambda pid: _forget_worker(config, pid))
+
 if __name__ == "__main__":
-    mcp.run()
\ No newline at end of file
+    main()
\ No newline at end of file
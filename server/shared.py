@@ -0,0 +1,250 @@
+"""
+State shared by the worker processes of one server.
+
+With several workers (server.py --workers N) every process has its own
+memory, so a weather result cached by one worker would be a miss in the
+others. The tool caches are therefore backed by one SQLite database in WAL
+mode, which lets any number of processes read concurrently while one
+writes. Each process keeps the entries it has seen decoded in memory, so
+only its first lookup of a key reaches the database.
+
+The same database collects each worker's metrics snapshot, so any worker
+can report figures for the whole server.
+"""
+import os
+import sqlite3
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from common import jsoncodec
+from server.cache import TTLCache
+
+# Default database location; override with SHARED_CACHE_PATH
+DEFAULT_SHARED_PATH = os.path.join(os.path.expanduser("~"), ".cache", "universal-mcp", "shared.db")
+
+# Seconds a query may wait for another process's write to finish. Queries run on the event
+# loop, so this is kept short; a cache lookup or store that times out is simply skipped.
+BUSY_TIMEOUT = 0.05
+
+
+class SharedStore:
+    """SQLite database (WAL mode) shared by the worker processes of one server."""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Open (or create) the database.
+
+        Args:
+            path: Database file (defaults to DEFAULT_SHARED_PATH)
+        """
+        self.path = path or DEFAULT_SHARED_PATH
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+        self._db = sqlite3.connect(self.path, isolation_level=None, timeout=5.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "name TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL, stored_at REAL NOT NULL, "
+            "PRIMARY KEY (name, key))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS cache_stored_at ON cache(name, stored_at)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS worker_metrics ("
+            "worker INTEGER PRIMARY KEY, data TEXT NOT NULL, updated REAL NOT NULL)"
+        )
+        # Workers starting together may wait for each other above; from here on nothing waits long
+        self._db.execute(f"PRAGMA busy_timeout = {int(BUSY_TIMEOUT * 1000)}")
+
+    def cache(self, name: str, maxsize: int = 256, ttl: float = 600.0,
+              memory_entries: int = 256) -> "SharedTTLCache":
+        """Return a cache stored in this database under `name`."""
+        return SharedTTLCache(self, name, maxsize=maxsize, ttl=ttl, memory_entries=memory_entries)
+
+    def publish_metrics(self, worker: int, data: Dict[str, Any]) -> None:
+        """Store the latest metrics snapshot of a worker, replacing its previous one."""
+        self._db.execute(
+            "INSERT OR REPLACE INTO worker_metrics (worker, data, updated) VALUES (?, ?, ?)",
+            (worker, jsoncodec.dumps(data), time.time())
+        )
+
+    def worker_metrics(self) -> Dict[int, Dict[str, Any]]:
+        """Return the latest metrics snapshot of every worker that has published one."""
+        return {
+            worker: jsoncodec.loads(data)
+            for worker, data in self._db.execute("SELECT worker, data FROM worker_metrics ORDER BY worker")
+        }
+
+    def forget_worker(self, worker: int) -> None:
+        """Drop the snapshot of a worker that has exited, so it no longer counts towards the totals."""
+        self._db.execute("DELETE FROM worker_metrics WHERE worker = ?", (worker,))
+
+    def reset_metrics(self) -> None:
+        """Forget the snapshots of earlier runs (called before the workers start)."""
+        self._db.execute("DELETE FROM worker_metrics")
+
+    def close(self) -> None:
+        """Close the database."""
+        self._db.close()
+
+
+class SharedTTLCache:
+    """
+    TTLCache whose entries are shared by all processes using the same SharedStore.
+
+    Entries expire at a wall-clock time, so every process agrees on when;
+    an entry read from the database stays in memory only for the rest of
+    its lifetime. When the table holds more than maxsize entries, expired
+    and then the oldest entries are dropped. If the database stays locked
+    by another process for longer than BUSY_TIMEOUT, a lookup counts as a
+    miss and a store only reaches this process's memory.
+    """
+
+    def __init__(self, store: SharedStore, name: str, maxsize: int = 256, ttl: float = 600.0,
+                 memory_entries: int = 256):
+        """
+        Initialize the cache.
+
+        Args:
+            store: Database the entries are kept in
+            name: Name of the cache within the database (e.g., 'weather')
+            maxsize: Maximum number of entries kept in the database
+            ttl: Seconds an entry stays valid after it was stored (inf for never)
+            memory_entries: Number of recently used entries also kept decoded in this process
+        """
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self._db = store._db
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self._memory = TTLCache(maxsize=min(memory_entries, maxsize), ttl=ttl)
+        self._size = self._count()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.busy = 0
+
+    def _count(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM cache WHERE name = ?", (self.name,)).fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._size
+
+    def get(self, key: Hashable, default: Any = None,
+            accept: Optional[Callable[[Any], bool]] = None) -> Any:
+        """
+        Return the cached value for key, or default if it is missing or expired.
+
+        If given, accept(value) decides whether the cached value serves this
+        lookup; a rejected value counts as a miss and default is returned.
+        """
+        value = self._memory.get(key)
+        if value is not None and (accept is None or accept(value)):
+            self.hits += 1
+            return value
+
+        now = time.time()
+        try:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM cache WHERE name = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (self.name, jsoncodec.dumps(key), now)
+            ).fetchone()
+        except sqlite3.OperationalError:
+            # Locked for too long; do not hold up the event loop for it
+            self.busy += 1
+            row = None
+        if row is None:
+            self.misses += 1
+            return default
+        # Another worker may have stored a value that serves the lookup where the copy in memory did not
+        value, expires_at = jsoncodec.loads(row[0]), row[1]
+        self._memory.set(key, value, ttl=float("inf") if expires_at is None else expires_at - now)
+        if accept is not None and not accept(value):
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.shared_hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value for every process, dropping the oldest entries if the cache is full."""
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        encoded_key = jsoncodec.dumps(key)
+        self._memory.set(key, value, ttl=ttl)
+        try:
+            exists = self._db.execute("SELECT 1 FROM cache WHERE name = ? AND key = ?", (self.name, encoded_key)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO cache (name, key, value, expires_at, stored_at) VALUES (?, ?, ?, ?, ?)",
+                (self.name, encoded_key, jsoncodec.dumps(value), None if ttl == float("inf") else now + ttl, now)
+            )
+            if not exists:
+                self._size += 1
+            if self._size > self.maxsize:
+                self._compact()
+        except sqlite3.OperationalError:
+            # Locked for too long; the other workers will fetch the value themselves
+            self.busy += 1
+
+    def _compact(self) -> None:
+        """Drop expired entries, then the oldest ones until the table is at 90% of maxsize."""
+        self._db.execute("DELETE FROM cache WHERE name = ? AND expires_at <= ?", (self.name, time.time()))
+        excess = self._count() - int(self.maxsize * 0.9)
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM cache WHERE name = ? AND key IN "
+                "(SELECT key FROM cache WHERE name = ? ORDER BY stored_at LIMIT ?)",
+                (self.name, self.name, excess)
+            )
+            self.evictions += excess
+        # Other workers write to the same table, so recount instead of tracking
+        self._size = self._count()
+
+    def configure(self, maxsize: int, ttl: float) -> None:
+        """Change the size limit and default time-to-live, keeping the current entries."""
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._memory.configure(min(self.memory_entries, maxsize), ttl)
+        self._size = self._count()
+        if self._size > self.maxsize:
+            self._compact()
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove an entry (from every process's view) and return its value (default if missing)."""
+        encoded_key = jsoncodec.dumps(key)
+        row = self._db.execute("SELECT value FROM cache WHERE name = ? AND key = ?", (self.name, encoded_key)).fetchone()
+        self._memory.pop(key)
+        if row is None:
+            return default
+        self._db.execute("DELETE FROM cache WHERE name = ? AND key = ?", (self.name, encoded_key))
+        self._size -= 1
+        return jsoncodec.loads(row[0])
+
+    def clear(self) -> None:
+        """Drop every entry (counters are kept)."""
+        self._memory.clear()
+        self._db.execute("DELETE FROM cache WHERE name = ?", (self.name,))
+        self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the cache counters and current size."""
+        lookups = self.hits + self.misses
+        return {
+            "size": self._size,
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "shared": True,
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "busy": self.busy,
+            "memory_entries": len(self._memory),
+        }
@@ -0,0 +1,604 @@
+"""
+Shared HTTP clients for the upstream APIs used by the server tools.
+
+A single long-lived httpx.AsyncClient is kept per upstream host, so DNS
+lookups, TCP connections and TLS sessions are reused across tool calls
+instead of being paid on every invocation.
+
+Every upstream has its own connection limits and timeouts, so one slow
+API cannot pile up sockets or stall the tools that use the others. The
+defaults can be overridden per upstream with environment variables named
+UPSTREAM_<NAME>_<SETTING>, e.g. UPSTREAM_SERPAPI_READ_TIMEOUT=30.
+"""
+import asyncio
+import importlib.util
+import os
+import time
+from dataclasses import dataclass, fields, replace
+from typing import Any, Dict, Mapping, Optional, Set
+
+import httpx
+
+from common.tracing import tracer
+from server.cache import HTTPCache
+from server.metrics import CallStats
+from server.resilience import (
+    CircuitBreaker,
+    Deadline,
+    DeadlineExceeded,
+    LatencyWindow,
+    RateLimitExceeded,
+    RetryBudget,
+    TokenBucket,
+    backoff_delay,
+)
+
+# HTTP/2 support in httpx needs the optional 'h2' package (httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Base URLs of the upstream APIs, keyed by the name used throughout the server
+UPSTREAMS: Dict[str, str] = {
+    "openweathermap": "https://api.openweathermap.org",
+    "coingecko": "https://api.coingecko.com",
+    "newsapi": "https://newsapi.org",
+    "jokeapi": "https://v2.jokeapi.dev",
+    "serpapi": "https://serpapi.com",
+    "dictionaryapi": "https://api.dictionaryapi.dev",
+}
+
+
+@dataclass(frozen=True)
+class UpstreamSettings:
+    """Connection pool limits and timeouts (in seconds) for one upstream."""
+    max_connections: int = 10
+    max_keepalive_connections: int = 5
+    keepalive_expiry: float = 30.0
+    connect_timeout: float = 5.0
+    read_timeout: float = 10.0
+    pool_timeout: float = 5.0
+    # Cache responses per HTTP semantics (Cache-Control max-age, ETag/Last-Modified revalidation)
+    http_cache: bool = False
+    # Token bucket guarding the API quota: requests per second (0 disables), bucket size
+    # and how long a call may queue for a token before failing
+    rate_limit: float = 0.0
+    rate_burst: int = 1
+    rate_limit_wait: float = 5.0
+    # Circuit breaker: failure share (errors, 5xx and calls slower than breaker_slow_call
+    # seconds) over the last breaker_window calls that opens the circuit, and for how long
+    breaker_failure_ratio: float = 0.5
+    breaker_slow_call: float = 5.0
+    breaker_window: int = 20
+    breaker_min_calls: int = 5
+    breaker_open_seconds: float = 30.0
+    # Retries of connection errors and 5xx replies, with jittered exponential backoff
+    retries: int = 2
+    retry_backoff: float = 0.1
+    retry_backoff_max: float = 2.0
+    # Hedging (opt-in): send a second identical request once the first has taken
+    # longer than the hedge_percentile of recent latencies; first reply wins
+    hedge: bool = False
+    hedge_percentile: float = 0.95
+    # Retries and hedges together may add at most this share of extra requests
+    retry_budget: float = 0.1
+
+    def __post_init__(self):
+        positive = ("max_connections", "connect_timeout", "read_timeout", "pool_timeout",
+                    "rate_burst", "breaker_window", "breaker_failure_ratio")
+        non_negative = ("max_keepalive_connections", "keepalive_expiry", "rate_limit", "rate_limit_wait",
+                        "breaker_slow_call", "breaker_min_calls", "breaker_open_seconds", "retries",
+                        "retry_backoff", "retry_backoff_max", "retry_budget")
+        for name in positive:
+            if getattr(self, name) <= 0:
+                raise ValueError(f"{name} must be positive, got {getattr(self, name)!r}")
+        for name in non_negative:
+            if getattr(self, name) < 0:
+                raise ValueError(f"{name} must not be negative, got {getattr(self, name)!r}")
+        if self.breaker_failure_ratio > 1 or not 0 < self.hedge_percentile < 1:
+            raise ValueError("breaker_failure_ratio must be in (0, 1] and hedge_percentile in (0, 1)")
+
+    @classmethod
+    def from_env(cls, name: str, base: Optional["UpstreamSettings"] = None,
+                 environ: Optional[Mapping[str, str]] = None) -> "UpstreamSettings":
+        """
+        Build settings for an upstream, applying UPSTREAM_<NAME>_<SETTING> overrides.
+
+        Args:
+            name: Upstream name (e.g., 'coingecko')
+            base: Defaults to start from (uses the class defaults if None)
+            environ: Variables to read the overrides from (defaults to os.environ)
+
+        Returns:
+            The resulting settings
+
+        Raises:
+            ValueError: If an override has the wrong type or is out of range
+        """
+        environ = os.environ if environ is None else environ
+        settings = base or cls()
+        overrides: Dict[str, Any] = {}
+        for field in fields(cls):
+            value = environ.get(f"UPSTREAM_{name.upper()}_{field.name.upper()}")
+            if value is not None:
+                try:
+                    if isinstance(getattr(settings, field.name), bool):
+                        overrides[field.name] = value.strip().lower() in ("1", "true", "yes", "on")
+                    else:
+                        overrides[field.name] = type(getattr(settings, field.name))(value)
+                except ValueError:
+                    raise ValueError(f"Invalid value for UPSTREAM_{name.upper()}_{field.name.upper()}: {value!r}") from None
+        try:
+            return replace(settings, **overrides)
+        except ValueError as e:
+            raise ValueError(f"Invalid settings for upstream {name}: {e}") from None
+
+    def per_worker(self, workers: int) -> "UpstreamSettings":
+        """
+        Return the settings for one of `workers` processes sharing this upstream's quota.
+
+        Each process keeps its own token bucket, so the rate and burst are
+        divided among them; the processes together stay within the quota.
+        """
+        if workers <= 1 or self.rate_limit <= 0:
+            return self
+        return replace(self, rate_limit=self.rate_limit / workers, rate_burst=max(self.rate_burst // workers, 1))
+
+    @property
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    @property
+    def timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(
+            connect=self.connect_timeout,
+            read=self.read_timeout,
+            write=self.connect_timeout,
+            pool=self.pool_timeout,
+        )
+
+
+# Per-upstream defaults; anything not listed uses the UpstreamSettings defaults.
+# Rate limits follow the free tiers: OpenWeatherMap 60/minute, NewsAPI 100/day, SerpAPI 100/month.
+DEFAULT_SETTINGS: Dict[str, UpstreamSettings] = {
+    "openweathermap": UpstreamSettings(rate_limit=1.0, rate_burst=60),
+    "newsapi": UpstreamSettings(read_timeout=15.0, http_cache=True, rate_limit=100 / 86400, rate_burst=100),
+    "serpapi": UpstreamSettings(max_connections=5, read_timeout=20.0, http_cache=True,
+                                rate_limit=100 / (30 * 86400), rate_burst=100, retries=0),
+    "jokeapi": UpstreamSettings(max_connections=5),
+}
+
+# Which of the per-request timeouts each httpx timeout error comes from
+_TIMEOUT_PHASES = {
+    httpx.ConnectTimeout: "connect",
+    httpx.ReadTimeout: "read",
+    httpx.WriteTimeout: "write",
+    httpx.PoolTimeout: "pool",
+}
+
+
+class PoolStats:
+    """Counters describing how an upstream's connection pool is used."""
+
+    def __init__(self, max_connections: int):
+        self.max_connections = max_connections
+        self.in_flight = 0
+        self.requests = 0
+        self.new_connections = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return a snapshot of the counters and the derived ratios."""
+        reused = max(self.requests - self.new_connections, 0)
+        return {
+            "in_flight": self.in_flight,
+            "max_connections": self.max_connections,
+            "occupancy": self.in_flight / self.max_connections,
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reuse_ratio": reused / self.requests if self.requests else 0.0,
+            "avg_wait_ms": self.total_wait / self.requests * 1000 if self.requests else 0.0,
+            "max_wait_ms": self.max_wait * 1000,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
+
+
+class _Upstream:
+    """Client, request gate and statistics of a single upstream."""
+
+    def __init__(self, name: str, base_url: str, settings: UpstreamSettings,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.name = name
+        self.settings = settings
+        self.transport = transport
+        self.client = self._new_client(base_url, settings, transport)
+        # Clients replaced by apply(), closed once their requests had time to finish
+        self._retiring: Set["asyncio.Task[None]"] = set()
+        # Requests wait here for a free slot, which lets us measure pool wait time
+        self.slots = asyncio.Semaphore(settings.max_connections)
+        self.stats = PoolStats(settings.max_connections)
+        # Requests actually sent: counts, server errors and latency (including the wait for a slot)
+        self.calls = CallStats()
+        self.rate_limiter = (TokenBucket(name, settings.rate_limit, settings.rate_burst)
+                             if settings.rate_limit > 0 else None)
+        self.breaker = CircuitBreaker(
+            name,
+            failure_ratio=settings.breaker_failure_ratio,
+            slow_call=settings.breaker_slow_call,
+            window=settings.breaker_window,
+            min_calls=settings.breaker_min_calls,
+            open_seconds=settings.breaker_open_seconds,
+        )
+        self.latency = LatencyWindow()
+        self.budget = RetryBudget(settings.retry_budget)
+
+    @staticmethod
+    def _new_client(base_url: str, settings: UpstreamSettings,
+                    transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=base_url,
+            http2=HTTP2_AVAILABLE,
+            limits=settings.limits,
+            timeout=settings.timeout,
+            transport=transport,
+        )
+
+    def apply(self, base_url: str, settings: UpstreamSettings) -> None:
+        """
+        Switch to new settings without dropping requests in flight.
+
+        Rate limiter, circuit breaker and retry budget are retuned in place and
+        keep their state. The client is only replaced when the base URL or the
+        connection limits change; the old one keeps serving the requests that
+        are using it and is closed once they had time to finish.
+        """
+        old = self.settings
+        self.settings = settings
+        if base_url.rstrip("/") != str(self.client.base_url).rstrip("/") or settings.limits != old.limits:
+            retired = self.client
+            self.client = self._new_client(base_url, settings, self.transport)
+            task = asyncio.ensure_future(self._close_later(retired, old.connect_timeout + old.read_timeout))
+            self._retiring.add(task)
+            task.add_done_callback(self._retiring.discard)
+        if settings.max_connections != old.max_connections:
+            # Requests holding a slot release it on the semaphore they acquired it from
+            self.slots = asyncio.Semaphore(settings.max_connections)
+            self.stats.max_connections = settings.max_connections
+
+        if settings.rate_limit <= 0:
+            self.rate_limiter = None
+        elif self.rate_limiter is None:
+            self.rate_limiter = TokenBucket(self.name, settings.rate_limit, settings.rate_burst)
+        else:
+            self.rate_limiter.configure(settings.rate_limit, settings.rate_burst)
+        self.breaker.configure(
+            failure_ratio=settings.breaker_failure_ratio,
+            slow_call=settings.breaker_slow_call,
+            window=settings.breaker_window,
+            min_calls=settings.breaker_min_calls,
+            open_seconds=settings.breaker_open_seconds,
+        )
+        self.budget.ratio = settings.retry_budget
+
+    @staticmethod
+    async def _close_later(client: httpx.AsyncClient, delay: float) -> None:
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            await client.aclose()
+
+    async def aclose(self) -> None:
+        """Close the client, including any replaced ones still waiting to be closed."""
+        retiring = list(self._retiring)
+        for task in retiring:
+            task.cancel()
+        await asyncio.gather(*retiring, return_exceptions=True)
+        await self.client.aclose()
+
+    def round_trip(self) -> float:
+        """Typical duration of a request (median of recent latencies, 0 while unknown)."""
+        return self.latency.percentile(0.5, min_samples=1) or 0.0
+
+    def has_time(self, deadline: Optional[Deadline], extra: float = 0.0) -> bool:
+        """Whether the time left before deadline covers `extra` seconds plus a typical round trip."""
+        return deadline is None or deadline.remaining() > extra + self.round_trip()
+
+    async def trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        """httpcore trace hook used to count newly opened connections."""
+        if event_name == "connection.connect_tcp.complete":
+            self.stats.new_connections += 1
+
+
+class UpstreamPool:
+    """Keep-alive HTTP clients for every upstream, one client per host."""
+
+    def __init__(self,
+                 upstreams: Optional[Dict[str, str]] = None,
+                 settings: Optional[Dict[str, UpstreamSettings]] = None,
+                 http_cache: Optional[HTTPCache] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        """
+        Create one client per upstream.
+
+        Args:
+            upstreams: Mapping of upstream name to base URL (defaults to UPSTREAMS)
+            settings: Per-upstream settings (defaults to DEFAULT_SETTINGS plus env overrides)
+            http_cache: Response cache used by upstreams with http_cache enabled
+            transport: Transport of every client instead of the network (e.g., httpx.MockTransport)
+        """
+        settings = settings or {}
+        self.http_cache = http_cache or HTTPCache()
+        self._transport = transport
+        self._upstreams: Dict[str, _Upstream] = {}
+        for name, base_url in (upstreams or UPSTREAMS).items():
+            upstream_settings = settings.get(name) or UpstreamSettings.from_env(name, DEFAULT_SETTINGS.get(name))
+            self._upstreams[name] = _Upstream(name, base_url, upstream_settings, self._transport)
+
+    def reconfigure(self, upstreams: Dict[str, str], settings: Dict[str, UpstreamSettings]) -> None:
+        """
+        Apply new base URLs and settings, keeping connections, caches and counters.
+
+        Args:
+            upstreams: Mapping of upstream name to base URL
+            settings: Per-upstream settings (DEFAULT_SETTINGS plus env overrides where missing)
+        """
+        for name, base_url in upstreams.items():
+            upstream_settings = settings.get(name) or UpstreamSettings.from_env(name, DEFAULT_SETTINGS.get(name))
+            entry = self._upstreams.get(name)
+            if entry is None:
+                self._upstreams[name] = _Upstream(name, base_url, upstream_settings, self._transport)
+            else:
+                entry.apply(base_url, upstream_settings)
+
+    def _get(self, upstream: str) -> _Upstream:
+        try:
+            return self._upstreams[upstream]
+        except KeyError:
+            raise ValueError(f"Unknown upstream: {upstream}") from None
+
+    def client(self, upstream: str) -> httpx.AsyncClient:
+        """Return the shared client for an upstream."""
+        return self._get(upstream).client
+
+    async def get(self, upstream: str, url: str, deadline: Optional[Deadline] = None,
+                  **kwargs: Any) -> httpx.Response:
+        """
+        Send a GET request through the shared client of an upstream.
+
+        Waits at most the upstream's rate_limit_wait for a request token and
+        at most its pool timeout for a free connection slot.
+        For upstreams with http_cache enabled, fresh cached responses are
+        returned without a request and stale ones are revalidated.
+
+        With a deadline, every wait and HTTP timeout is capped by the time
+        left, and retries and hedges are only sent while it covers a typical
+        round trip. If it does not even cover the first one, a stale cached
+        response is returned if there is one; otherwise the call fails at once.
+
+        Args:
+            upstream: Upstream name (e.g., 'openweathermap')
+            url: Path relative to the upstream base URL
+            deadline: Time by which the caller needs the response (no limit if None)
+            **kwargs: Extra arguments passed to httpx (params, headers, ...)
+
+        Returns:
+            The HTTP response
+
+        Raises:
+            CircuitOpenError: If the upstream is failing and its circuit is open
+            RateLimitExceeded: If the upstream's quota allows no request in time
+            DeadlineExceeded: If the time left cannot cover a request
+            httpx.PoolTimeout: If no connection slot became free in time
+        """
+        entry = self._get(upstream)
+        extensions = {**kwargs.pop("extensions", {}), "trace": entry.trace}
+        request = entry.client.build_request("GET", url, extensions=extensions, **kwargs)
+        if not entry.settings.http_cache:
+            return await self._send_with_retries(upstream, entry, request, deadline)
+
+        key = str(request.url)
+        cached, conditional = self.http_cache.lookup(key)
+        if cached is None and not entry.has_time(deadline):
+            # No time to revalidate: a stale copy beats a failure
+            cached = self.http_cache.get_stale(key)
+        if cached is None:
+            request.headers.update(conditional)
+            response = await self._send_with_retries(upstream, entry, request, deadline)
+            if response.status_code == 304 and conditional:
+                cached = self.http_cache.revalidate(key, response)
+            if cached is None:
+                self.http_cache.store(key, response)
+                return response
+        return httpx.Response(200, headers=cached.headers, content=cached.body, request=request)
+
+    async def _send_with_retries(self, upstream: str, entry: _Upstream, request: httpx.Request,
+                                 deadline: Optional[Deadline]) -> httpx.Response:
+        settings = entry.settings
+        if deadline is not None:
+            deadline.check(f"a request to {upstream}", entry.round_trip())
+        entry.budget.deposit()
+        send = self._send_hedged if settings.hedge else self._send
+
+        for attempt in range(settings.retries + 1):
+            delay = backoff_delay(attempt, settings.retry_backoff, settings.retry_backoff_max)
+            try:
+                response = await send(upstream, entry, request, deadline)
+            except httpx.PoolTimeout:
+                raise
+            except httpx.TransportError:
+                if not self._may_retry(entry, attempt, delay, deadline):
+                    raise
+            else:
+                if response.status_code < 500 or not self._may_retry(entry, attempt, delay, deadline):
+                    return response
+            entry.stats.retries += 1
+            await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+    @staticmethod
+    def _may_retry(entry: _Upstream, attempt: int, delay: float, deadline: Optional[Deadline]) -> bool:
+        # Attempts left, time for the backoff plus another round trip, and room in the retry budget
+        return (attempt < entry.settings.retries and entry.has_time(deadline, delay)
+                and entry.budget.try_withdraw())
+
+    async def _send_hedged(self, upstream: str, entry: _Upstream, request: httpx.Request,
+                           deadline: Optional[Deadline]) -> httpx.Response:
+        tasks = [asyncio.ensure_future(self._send(upstream, entry, request, deadline))]
+        try:
+            delay = entry.latency.percentile(entry.settings.hedge_percentile)
+            if delay is not None and entry.has_time(deadline, delay):
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done and entry.has_time(deadline) and entry.budget.try_withdraw():
+                    # The hedge never queues for a rate-limit token; without a free one it fails at once
+                    hedge_request = httpx.Request(request.method, request.url, headers=request.headers,
+                                                  extensions=request.extensions)
+                    tasks.append(asyncio.ensure_future(
+                        self._send(upstream, entry, hedge_request, deadline, wait_for_token=False)
+                    ))
+                    entry.stats.hedges += 1
+
+            # First successful reply wins; if all fail, report the original request's error
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not tasks[0]:
+                            entry.stats.hedge_wins += 1
+                        return task.result()
+            return tasks[0].result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _send(self, upstream: str, entry: _Upstream, request: httpx.Request,
+                    deadline: Optional[Deadline], wait_for_token: bool = True) -> httpx.Response:
+        # Fail fast while the upstream's circuit is open, before queueing for tokens or slots
+        probe = entry.breaker.before_call()
+        try:
+            if entry.rate_limiter is not None:
+                if not wait_for_token:
+                    if not entry.rate_limiter.try_acquire():
+                        raise RateLimitExceeded(upstream, 1 / entry.rate_limiter.rate)
+                else:
+                    wait = entry.settings.rate_limit_wait
+                    if deadline is not None:
+                        # Leave time for the request itself after the token arrives
+                        wait = min(wait, deadline.remaining() - entry.round_trip())
+                    await entry.rate_limiter.acquire(max(wait, 0.0))
+            started = entry.calls.start()
+            try:
+                response = await self._send_pooled(upstream, entry, request, deadline)
+            except asyncio.CancelledError:
+                # Cancelled by the caller, e.g. a hedge whose twin answered first: no outcome to record
+                entry.calls.discard()
+                raise
+            except BaseException:
+                entry.calls.finish(started, error=True)
+                raise
+        except httpx.TransportError:
+            # Connection failures and the upstream's own timeouts (including pool timeouts) count against it
+            entry.breaker.record(False, 0.0)
+            raise
+        except BaseException:
+            entry.breaker.release(probe)
+            raise
+        entry.calls.finish(started, error=response.status_code >= 500 or response.status_code == 429)
+        elapsed = time.perf_counter() - started
+        entry.breaker.record(response.status_code < 500, elapsed)
+        if response.status_code < 500:
+            entry.latency.add(elapsed)
+        return response
+
+    async def _send_pooled(self, upstream: str, entry: _Upstream, request: httpx.Request,
+                           deadline: Optional[Deadline]) -> httpx.Response:
+        stats = entry.stats
+        # Captured so the slot is released where it was taken even if the settings change meanwhile
+        slots = entry.slots
+        settings = entry.settings
+        pool_timeout = settings.pool_timeout
+        if deadline is not None:
+            pool_timeout = min(pool_timeout, deadline.check(f"a request to {upstream}"))
+
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(slots.acquire(), pool_timeout)
+        except asyncio.TimeoutError:
+            if pool_timeout < settings.pool_timeout:
+                # The caller ran out of time, which says nothing about the upstream
+                raise DeadlineExceeded(f"a free connection to {upstream}", deadline.remaining()) from None
+            raise httpx.PoolTimeout(f"No free connection to {upstream} within {pool_timeout:.1f}s") from None
+        waited = time.perf_counter() - started
+
+        # Timeouts are set per request so reloaded settings apply without a new client;
+        # with a deadline every one of them is capped by what is left of the caller's budget
+        timeout = settings.timeout.as_dict()
+        capped = set()
+        if deadline is not None:
+            remaining = deadline.remaining()
+            capped = {name for name, value in timeout.items() if remaining < value}
+            timeout = {name: min(value, remaining) for name, value in timeout.items()}
+        request.extensions = {**request.extensions, "timeout": timeout}
+
+        stats.requests += 1
+        stats.total_wait += waited
+        stats.max_wait = max(stats.max_wait, waited)
+        stats.in_flight += 1
+        try:
+            # The query string is left out of the span, as it may carry API keys
+            with tracer.span(f"{request.method} {upstream}", "client", attributes={
+                "http.request.method": request.method,
+                "server.address": request.url.host,
+                "url.path": request.url.path,
+            }) as span:
+                if span is not None:
+                    request.headers["traceparent"] = span.traceparent
+                try:
+                    response = await entry.client.send(request)
+                except httpx.TimeoutException as e:
+                    # Only the upstream's own timeouts count against it; one cut short by the
+                    # caller's deadline is reported as such and leaves the circuit alone
+                    if _TIMEOUT_PHASES.get(type(e)) in capped:
+                        raise DeadlineExceeded(f"a response from {upstream}", deadline.remaining()) from e
+                    raise
+                if span is not None:
+                    span.set("http.response.status_code", response.status_code)
+                    if response.status_code >= 500:
+                        span.fail(f"HTTP {response.status_code}")
+            if response.status_code == 429 and entry.rate_limiter is not None:
+                entry.rate_limiter.drain()
+            return response
+        finally:
+            stats.in_flight -= 1
+            slots.release()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return pool statistics for every upstream."""
+        return {
+            name: {
+                **entry.stats.as_dict(),
+                "rate_limit": entry.rate_limiter.stats() if entry.rate_limiter else None,
+                "circuit": entry.breaker.stats(),
+                "retry_budget": entry.budget.stats(),
+                "p95_ms": (entry.latency.percentile(0.95) or 0.0) * 1000,
+                "calls": entry.calls.as_dict(),
+            }
+            for name, entry in self._upstreams.items()
+        }
+
+    def call_stats(self) -> Dict[str, CallStats]:
+        """Return the request counters and latency histogram of every upstream."""
+        return {name: entry.calls for name, entry in self._upstreams.items()}
+
+    async def aclose(self) -> None:
+        """Close every client and release its connections."""
+        for entry in self._upstreams.values():
+            await entry.aclose()
@@ -0,0 +1,95 @@
+"""
+Pre-fork worker processes sharing one listening socket.
+
+The parent binds the socket, forks the workers and then only supervises
+them: a worker that dies is replaced, SIGHUP is passed on to every worker
+(each reloads its configuration), and SIGINT/SIGTERM stop them all. The
+kernel spreads incoming connections over the workers accepting on the
+socket. Nothing but the socket may be opened before forking; each worker
+sets up its own event loop, connections and caches.
+"""
+import logging
+import os
+import signal
+import socket
+import time
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger("universal-mcp")
+
+# A worker dying sooner than this after it started is restarted only after this delay, so a
+# worker that cannot start does not fork in a tight loop
+RESTART_DELAY = 1.0
+
+
+def run_workers(count: int, sock: socket.socket, serve: Callable[[socket.socket], None],
+                on_exit: Optional[Callable[[int], None]] = None) -> None:
+    """
+    Fork `count` workers running serve(sock) and keep them running until SIGINT or SIGTERM.
+
+    Args:
+        count: Number of worker processes
+        sock: Bound, listening socket the workers accept connections on
+        serve: Runs a worker until it is told to stop (SIGINT or SIGTERM)
+        on_exit: Called in the parent with the pid of a worker that died, before it is replaced
+    """
+    workers: Dict[int, float] = {}  # pid -> start time
+    stopping = False
+
+    def spawn() -> None:
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            # Until the worker installs its reload handler, a SIGHUP must not kill it
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            code = 0
+            try:
+                serve(sock)
+            except KeyboardInterrupt:
+                pass
+            except BaseException:
+                logger.exception("Worker %d failed", os.getpid())
+                code = 1
+            finally:
+                os._exit(code)
+        workers[pid] = time.monotonic()
+        logger.info("Started worker %d", pid)
+
+    def signal_workers(signum: int) -> None:
+        for pid in list(workers):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def stop(signum: int, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        signal_workers(signal.SIGTERM)
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGHUP, lambda signum, frame: signal_workers(signal.SIGHUP))
+    for _ in range(count):
+        spawn()
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = workers.pop(pid, None)
+        if started is None or stopping:
+            continue
+        logger.warning("Worker %d exited with status %d; restarting it", pid, os.waitstatus_to_exitcode(status))
+        if on_exit is not None:
+            try:
+                on_exit(pid)
+            except Exception:
+                logger.exception("Error cleaning up after worker %d", pid)
+        if time.monotonic() - started < RESTART_DELAY:
+            time.sleep(RESTART_DELAY)
+        if not stopping:
+            spawn()
+    sock.close()
@@ -32,4 +32,5 @@ setup(
         ],
     },
     include_package_data=True,
+    package_data={"server": ["data/*.json"]},
 )
\ No newline at end of file
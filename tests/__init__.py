@@ -0,0 +1,19 @@
+"""
+Unit tests for Universal MCP.
+
+Run from the repository root with:
+    python -m unittest discover -s tests -t .
+"""
+
+
+class FakeClock:
+    """Monotonic clock that only moves when told to, for the classes taking a `clock` argument."""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
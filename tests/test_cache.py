@@ -0,0 +1,184 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import httpx
+
+from server.cache import HTTPCache, SingleFlight, TTLCache
+from server.resilience import Deadline
+from server.shared import SharedStore
+from tests import FakeClock
+
+
+class TTLCacheTest(unittest.TestCase):
+    def test_entries_expire(self):
+        clock = FakeClock()
+        cache = TTLCache(maxsize=4, ttl=10.0, clock=clock)
+        cache.set("a", 1)
+        cache.set("b", 2, ttl=20.0)
+        clock.advance(10.0)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("b"), 2)
+        self.assertEqual((cache.hits, cache.misses, cache.expirations), (1, 1, 1))
+
+    def test_evicts_least_recently_used(self):
+        cache = TTLCache(maxsize=2, ttl=10.0, clock=FakeClock())
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+
+    def test_rejected_value_is_a_miss(self):
+        cache = TTLCache(maxsize=2, ttl=10.0, clock=FakeClock())
+        cache.set("q", [1, 2])
+        self.assertEqual(cache.get("q", "none", accept=lambda value: len(value) >= 5), "none")
+        self.assertEqual(cache.get("q", accept=lambda value: len(value) >= 2), [1, 2])
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+
+class SingleFlightTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.flight = SingleFlight()
+        self.started = 0
+
+    async def fetch(self, seconds: float = 0.05) -> str:
+        self.started += 1
+        await asyncio.sleep(seconds)
+        return f"result {self.started}"
+
+    async def test_concurrent_calls_share_one_fetch(self):
+        results = await asyncio.gather(*(self.flight.do("key", self.fetch) for _ in range(3)))
+        self.assertEqual(results, ["result 1"] * 3)
+        self.assertEqual((self.flight.calls, self.flight.coalesced), (1, 2))
+        self.assertEqual(self.flight.stats()["in_flight"], 0)
+
+    async def test_shorter_deadline_joins_a_longer_one(self):
+        first = asyncio.ensure_future(self.flight.do("key", self.fetch, deadline=Deadline(5.0)))
+        await asyncio.sleep(0)
+        second = await self.flight.do("key", self.fetch, deadline=Deadline(1.0))
+        self.assertEqual((await first, second), ("result 1", "result 1"))
+        self.assertEqual(self.flight.coalesced, 1)
+
+    async def test_longer_deadline_does_not_inherit_a_shorter_one(self):
+        async def short_lived() -> str:
+            return await deadline.wait(self.fetch(0.2), "the fetch")
+
+        deadline = Deadline(0.05)
+        first = asyncio.ensure_future(self.flight.do("key", short_lived, deadline=deadline))
+        await asyncio.sleep(0)
+        second = await self.flight.do("key", self.fetch, deadline=Deadline(5.0))
+        self.assertEqual(second, "result 2")
+        with self.assertRaises(Exception):
+            await first
+        self.assertEqual((self.flight.calls, self.flight.coalesced), (2, 0))
+
+    async def test_call_without_deadline_never_joins_one_with_a_deadline(self):
+        first = asyncio.ensure_future(self.flight.do("key", self.fetch, deadline=Deadline(5.0)))
+        await asyncio.sleep(0)
+        await self.flight.do("key", self.fetch)
+        await first
+        self.assertEqual((self.flight.calls, self.flight.coalesced), (2, 0))
+
+    async def test_cancelled_caller_leaves_the_fetch_running(self):
+        first = asyncio.ensure_future(self.flight.do("key", self.fetch))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(self.flight.do("key", self.fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        self.assertEqual(await second, "result 1")
+
+
+class HTTPCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = HTTPCache(clock=self.clock)
+
+    @staticmethod
+    def response(status: int = 200, **headers: str) -> httpx.Response:
+        return httpx.Response(status, headers={name.replace("_", "-"): value for name, value in headers.items()},
+                              content=b"body")
+
+    def test_fresh_then_stale_with_validators(self):
+        self.cache.store("url", self.response(cache_control="max-age=60", etag='"v1"'))
+        entry, conditional = self.cache.lookup("url")
+        self.assertEqual((entry.body, conditional), (b"body", {}))
+
+        self.clock.advance(60.0)
+        entry, conditional = self.cache.lookup("url")
+        self.assertIsNone(entry)
+        self.assertEqual(conditional, {"If-None-Match": '"v1"'})
+
+    def test_not_modified_refreshes_the_entry(self):
+        self.cache.store("url", self.response(cache_control="max-age=60", etag='"v1"'))
+        self.clock.advance(60.0)
+        entry = self.cache.revalidate("url", self.response(304, cache_control="max-age=30"))
+        self.assertEqual(entry.body, b"body")
+        self.clock.advance(29.0)
+        self.assertIsNotNone(self.cache.lookup("url")[0])
+        self.assertEqual(self.cache.stats()["revalidated"], 1)
+
+    def test_age_counts_against_max_age(self):
+        self.cache.store("url", self.response(cache_control="max-age=60", age="50"))
+        self.clock.advance(10.0)
+        self.assertIsNone(self.cache.lookup("url")[0])
+
+    def test_uncacheable_responses_are_not_stored(self):
+        self.cache.store("no-store", self.response(cache_control="no-store, max-age=60"))
+        self.cache.store("no-validator", self.response())
+        self.cache.store("error", self.response(500, cache_control="max-age=60"))
+        for key in ("no-store", "no-validator", "error"):
+            self.assertEqual(self.cache.lookup(key), (None, {}))
+        self.assertEqual(self.cache.stats()["misses"], 3)
+
+
+class SharedTTLCacheTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "shared.db")
+        self.stores = [SharedStore(self.path), SharedStore(self.path)]
+        for store in self.stores:
+            self.addCleanup(store.close)
+
+    def test_value_stored_by_one_worker_serves_another(self):
+        mine, theirs = (store.cache("weather") for store in self.stores)
+        mine.set(("london", "metric"), {"temp": 12.5})
+        self.assertEqual(theirs.get(("london", "metric")), {"temp": 12.5})
+        self.assertEqual((theirs.hits, theirs.shared_hits), (1, 1))
+        self.assertIsNone(theirs.get(("paris", "metric")))
+
+    def test_rejected_memory_copy_falls_through_to_the_database(self):
+        mine, theirs = (store.cache("search") for store in self.stores)
+        theirs.set("query", [1])
+        mine.set("query", [1, 2, 3])
+        self.assertEqual(theirs.get("query", accept=lambda value: len(value) >= 3), [1, 2, 3])
+        self.assertEqual(theirs.misses, 0)
+        self.assertIsNone(theirs.get("query", accept=lambda value: len(value) >= 5))
+        self.assertEqual(theirs.misses, 1)
+
+    def test_compacts_to_maxsize(self):
+        cache = self.stores[0].cache("jokes", maxsize=10)
+        for i in range(11):
+            cache.set(i, i)
+        self.assertEqual(len(cache), 9)
+        self.assertIsNone(self.stores[1].cache("jokes", memory_entries=1).get(0))
+
+    def test_locked_database_degrades_to_memory(self):
+        mine, theirs = (store.cache("weather") for store in self.stores)
+        locker = sqlite3.connect(self.path, isolation_level=None)
+        self.addCleanup(locker.close)
+        locker.execute("BEGIN EXCLUSIVE")
+        mine.set("london", 12.5)
+        self.assertEqual(mine.get("london"), 12.5)
+        # WAL readers are not blocked by the writer, they just do not see the value
+        self.assertIsNone(theirs.get("london"))
+        self.assertEqual((mine.busy, theirs.misses), (1, 1))
+        locker.execute("ROLLBACK")
+
+
+if __name__ == "__main__":
+    unittest.main()
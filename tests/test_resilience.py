@@ -0,0 +1,153 @@
+import asyncio
+import unittest
+
+from server.resilience import (
+    CircuitBreaker, CircuitOpenError, Deadline, DeadlineExceeded, RateLimitExceeded, RetryBudget, TokenBucket,
+)
+from tests import FakeClock
+
+
+class TokenBucketTest(unittest.IsolatedAsyncioTestCase):
+    async def test_zero_timeout_takes_a_free_token(self):
+        bucket = TokenBucket("api", rate=1.0, burst=2, clock=FakeClock())
+        self.assertEqual(await bucket.acquire(0), 0.0)
+        self.assertEqual(await bucket.acquire(0), 0.0)
+        with self.assertRaises(RateLimitExceeded):
+            await bucket.acquire(0)
+        self.assertEqual((bucket.acquired, bucket.rejected), (2, 1))
+
+    async def test_refills_over_time(self):
+        clock = FakeClock()
+        bucket = TokenBucket("api", rate=2.0, burst=1, clock=clock)
+        self.assertTrue(bucket.try_acquire())
+        self.assertFalse(bucket.try_acquire())
+        clock.advance(0.5)
+        self.assertTrue(bucket.try_acquire())
+
+    async def test_rejects_when_the_token_comes_too_late(self):
+        bucket = TokenBucket("api", rate=1.0, burst=1, clock=FakeClock())
+        await bucket.acquire(0)
+        with self.assertRaises(RateLimitExceeded) as caught:
+            await bucket.acquire(0.5)
+        self.assertIn("1.0s", str(caught.exception))
+
+    async def test_queued_callers_are_served_in_turn(self):
+        bucket = TokenBucket("api", rate=50.0, burst=1)
+        waits = await asyncio.gather(*(bucket.acquire(1.0) for _ in range(3)))
+        self.assertEqual(waits[0], 0.0)
+        self.assertGreater(waits[2], waits[1])
+        self.assertEqual(bucket.waiting, 0)
+
+    async def test_drain_empties_the_bucket(self):
+        bucket = TokenBucket("api", rate=1.0, burst=5, clock=FakeClock())
+        bucket.drain()
+        self.assertFalse(bucket.try_acquire())
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker("api", failure_ratio=0.5, slow_call=1.0, window=4, min_calls=4,
+                                      open_seconds=10.0, clock=self.clock)
+
+    def call(self, success: bool, duration: float = 0.1) -> None:
+        self.assertFalse(self.breaker.before_call())
+        self.breaker.record(success, duration)
+
+    def trip(self) -> None:
+        for success in (True, True, False, False):
+            self.call(success)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+    def test_stays_closed_below_min_calls(self):
+        for _ in range(3):
+            self.call(False)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_opens_at_failure_ratio_and_rejects(self):
+        self.trip()
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+        self.assertEqual(self.breaker.stats()["rejected"], 1)
+
+    def test_slow_calls_count_as_failures(self):
+        for duration in (0.1, 0.1, 2.0, 2.0):
+            self.call(True, duration)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+    def test_half_open_lets_one_probe_through(self):
+        self.trip()
+        self.clock.advance(10.0)
+        self.assertTrue(self.breaker.before_call())
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+
+    def test_successful_probe_closes(self):
+        self.trip()
+        self.clock.advance(10.0)
+        self.breaker.before_call()
+        self.breaker.record(True, 0.1)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(self.breaker.stats()["failure_ratio"], 0.0)
+
+    def test_failed_probe_opens_again(self):
+        self.trip()
+        self.clock.advance(10.0)
+        self.breaker.before_call()
+        self.breaker.record(False, 0.0)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(self.breaker.times_opened, 2)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+
+    def test_released_probe_frees_the_slot(self):
+        self.trip()
+        self.clock.advance(10.0)
+        probe = self.breaker.before_call()
+        self.breaker.release(probe)
+        self.assertTrue(self.breaker.before_call())
+
+    def test_released_non_probe_keeps_the_probe_slot(self):
+        self.assertFalse(self.breaker.before_call())  # In flight while the circuit trips
+        self.trip()
+        self.clock.advance(10.0)
+        self.assertTrue(self.breaker.before_call())
+        self.breaker.release(False)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+
+
+class RetryBudgetTest(unittest.TestCase):
+    def test_reserve_then_ratio_of_requests(self):
+        budget = RetryBudget(ratio=0.5, reserve=1.0)
+        self.assertTrue(budget.try_withdraw())
+        self.assertFalse(budget.try_withdraw())
+        budget.deposit()
+        self.assertFalse(budget.try_withdraw())
+        budget.deposit()
+        self.assertTrue(budget.try_withdraw())
+        self.assertEqual((budget.withdrawn, budget.denied), (2, 2))
+
+
+class DeadlineTest(unittest.IsolatedAsyncioTestCase):
+    async def test_remaining_and_check(self):
+        clock = FakeClock()
+        deadline = Deadline(1.0, clock=clock)
+        self.assertEqual(deadline.check("a step", 0.5), 1.0)
+        clock.advance(0.75)
+        self.assertEqual(deadline.remaining(), 0.25)
+        with self.assertRaises(DeadlineExceeded):
+            deadline.check("a step", 0.5)
+        clock.advance(1.0)
+        self.assertEqual(deadline.remaining(), 0.0)
+
+    async def test_wait_gives_up_at_the_deadline(self):
+        deadline = Deadline(0.01)
+        with self.assertRaises(DeadlineExceeded):
+            await deadline.wait(asyncio.sleep(1), "a slow step")
+        self.assertEqual(await Deadline(1.0).wait(asyncio.sleep(0, "done"), "a fast step"), "done")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+import asyncio
+import unittest
+
+import httpx
+
+from server.resilience import CircuitBreaker, CircuitOpenError, Deadline, DeadlineExceeded
+from server.upstream import UpstreamPool, UpstreamSettings
+
+
+class UpstreamPoolTest(unittest.IsolatedAsyncioTestCase):
+    """Requests go through httpx.MockTransport; self.handler decides the replies."""
+
+    def setUp(self):
+        self.requests = []
+        self.handler = self.ok
+
+    async def ok(self, request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"ok": True})
+
+    async def pool(self, **settings) -> UpstreamPool:
+        async def handle(request: httpx.Request) -> httpx.Response:
+            self.requests.append(request)
+            return await self.handler(request)
+
+        pool = UpstreamPool({"api": "https://api.example.com"}, {"api": UpstreamSettings(**settings)},
+                            transport=httpx.MockTransport(handle))
+        self.addAsyncCleanup(pool.aclose)
+        return pool
+
+    @staticmethod
+    async def read_timeout(request: httpx.Request) -> httpx.Response:
+        # MockTransport ignores timeouts; honour the read timeout the pool set on the request
+        await asyncio.sleep(request.extensions["timeout"]["read"])
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    async def test_retries_server_errors(self):
+        pool = await self.pool(retry_backoff=0.0)
+        replies = iter([503, 200])
+
+        async def flaky(request):
+            return httpx.Response(next(replies))
+
+        self.handler = flaky
+        response = await pool.get("api", "/")
+        self.assertEqual(response.status_code, 200)
+        stats = pool.stats()["api"]
+        self.assertEqual((stats["retries"], stats["calls"]["calls"], stats["calls"]["errors"]), (1, 2, 1))
+
+    async def test_breaker_opens_and_fails_fast(self):
+        pool = await self.pool(retries=0, breaker_min_calls=2, breaker_open_seconds=60.0)
+
+        async def failing(request):
+            raise httpx.ConnectError("refused", request=request)
+
+        self.handler = failing
+        for _ in range(2):
+            with self.assertRaises(httpx.ConnectError):
+                await pool.get("api", "/")
+        with self.assertRaises(CircuitOpenError):
+            await pool.get("api", "/")
+        self.assertEqual(len(self.requests), 2)
+        self.assertEqual(pool.stats()["api"]["circuit"]["state"], CircuitBreaker.OPEN)
+
+    async def test_own_read_timeout_counts_against_the_upstream(self):
+        pool = await self.pool(retries=0, read_timeout=0.01, breaker_min_calls=1)
+        self.handler = self.read_timeout
+        with self.assertRaises(httpx.ReadTimeout):
+            await pool.get("api", "/", deadline=Deadline(5.0))
+        self.assertEqual(pool.stats()["api"]["circuit"]["state"], CircuitBreaker.OPEN)
+
+    async def test_timeout_cut_short_by_the_deadline_leaves_the_circuit_closed(self):
+        pool = await self.pool(retries=0, breaker_min_calls=1)
+        self.handler = self.read_timeout
+        with self.assertRaises(DeadlineExceeded):
+            await pool.get("api", "/", deadline=Deadline(0.01))
+        stats = pool.stats()["api"]
+        self.assertEqual(stats["circuit"]["state"], CircuitBreaker.CLOSED)
+        self.assertEqual(stats["calls"]["in_flight"], 0)
+
+    async def test_cancelled_probe_frees_the_probe_slot(self):
+        pool = await self.pool(retries=0, breaker_min_calls=1, breaker_open_seconds=0.01)
+
+        async def failing(request):
+            raise httpx.ConnectError("refused", request=request)
+
+        async def hanging(request):
+            await asyncio.sleep(60)
+
+        self.handler = failing
+        with self.assertRaises(httpx.ConnectError):
+            await pool.get("api", "/")
+        await asyncio.sleep(0.02)
+
+        self.handler = hanging
+        probe = asyncio.ensure_future(pool.get("api", "/"))
+        await asyncio.sleep(0.01)
+        self.assertEqual(pool.stats()["api"]["circuit"]["state"], CircuitBreaker.HALF_OPEN)
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions=True)
+
+        self.handler = self.ok
+        response = await pool.get("api", "/")
+        self.assertEqual(response.status_code, 200)
+        stats = pool.stats()["api"]
+        self.assertEqual(stats["circuit"]["state"], CircuitBreaker.CLOSED)
+        self.assertEqual((stats["calls"]["calls"], stats["calls"]["errors"]), (2, 1))
+
+    async def test_hedge_loser_is_not_counted_as_an_error(self):
+        pool = await self.pool(hedge=True, retries=0, retry_budget=1.0)
+        for _ in range(20):
+            await pool.get("api", "/")
+
+        async def slow_first(request):
+            if len(self.requests) == 21:
+                await asyncio.sleep(1.0)
+            return httpx.Response(200, json={"ok": True})
+
+        self.handler = slow_first
+        response = await pool.get("api", "/")
+        self.assertEqual(response.status_code, 200)
+        await asyncio.sleep(0)  # Let the cancelled original unwind
+
+        stats = pool.stats()["api"]
+        self.assertEqual((stats["hedges"], stats["hedge_wins"]), (1, 1))
+        self.assertEqual((stats["calls"]["calls"], stats["calls"]["errors"], stats["calls"]["in_flight"]), (21, 0, 0))
+        self.assertEqual(stats["circuit"]["failure_ratio"], 0.0)
+
+    async def test_http_cache_revalidates_stale_responses(self):
+        pool = await self.pool(http_cache=True)
+
+        async def validated(request):
+            if request.headers.get("if-none-match") == '"v1"':
+                return httpx.Response(304, headers={"etag": '"v1"'})
+            return httpx.Response(200, headers={"etag": '"v1"', "cache-control": "max-age=0"}, json={"n": 1})
+
+        self.handler = validated
+        first = await pool.get("api", "/items")
+        second = await pool.get("api", "/items")
+        self.assertEqual((first.json(), second.json(), second.status_code), ({"n": 1}, {"n": 1}, 200))
+        self.assertEqual(pool.http_cache.stats()["revalidated"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()